@@ -0,0 +1,189 @@
+""" Stage benchmark: times each processing stage on a synthetic (or given) export and reports throughput and peak memory. """
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from contextlib import redirect_stdout
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import whatsapp_repackager as repackager
+from generate_export import add_generator_arguments, generate_export, generator_options
+
+STAGES = ['extract', 'join_lines', 'parse', 'activity', 'csv', 'json', 'ndjson', 'xlsx', 'parquet', 'outputs', 'pseudonymize']
+
+def run_pipeline(zip_path, work_dir, stages, measure):
+    # Runs the stages in order on a fresh output folder; measure(stage, function) runs and records one stage
+    output_folder = work_dir / zip_path.stem
+    shutil.rmtree(output_folder, ignore_errors=True)
+    attachments_folder = output_folder / 'attachments'
+    attachments_folder.mkdir(parents=True)
+    txt_name = f"{zip_path.stem}.txt"
+    txt_file = output_folder / txt_name
+    conversation_name = zip_path.stem
+    data = {}
+
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        def extract():
+            data['attachment_index'] = repackager.index_zip_attachments(zip_ref, txt_name)
+            repackager.extract_zip_member(zip_ref, zip_ref.getinfo(txt_name), txt_file)
+            return len(data['attachment_index'].sources)
+        measure('extract', extract)
+
+        if 'join_lines' in stages:
+            measure('join_lines', lambda: sum(1 for _ in repackager.iter_chat_messages(txt_file)))
+
+        def parse():
+            data['messages'], data['senders'], _, data['stats'] = repackager.parse_whatsapp_chat(txt_file, attachments_folder, False, data['attachment_index'], zip_ref, {})
+            return len(data['messages'])
+        measure('parse', parse)
+
+    messages, senders, stats = data['messages'], data['senders'], data['stats']
+    summary_rows = stats.summary_rows(senders, {})
+    if 'activity' in stages:
+        measure('activity', lambda: repackager.write_activity_csvs(repackager.finish_activity_tables(repackager.compute_activity_tables(messages, senders, {})), output_folder, 'chat', '') or len(messages))
+    if 'csv' in stages:
+        measure('csv', lambda: repackager.create_csv(conversation_name, messages, senders, output_folder / 'chat.csv', attachments_folder, {}) or len(messages))
+    if 'json' in stages:
+        measure('json', lambda: repackager.create_json(conversation_name, messages, output_folder / 'chat.json', {}) or len(messages))
+    if 'ndjson' in stages:
+        measure('ndjson', lambda: repackager.create_json(conversation_name, messages, output_folder / 'chat.ndjson', {}, ndjson=True) or len(messages))
+    if 'xlsx' in stages:
+        measure('xlsx', lambda: repackager.create_excel(conversation_name, messages, senders, output_folder / 'chat.xlsx', attachments_folder, {}, summary_rows) or len(messages))
+    if 'parquet' in stages:
+        measure('parquet', lambda: repackager.create_parquet(conversation_name, messages, output_folder / 'chat.parquet', {}) or len(messages))
+
+    if 'outputs' in stages:
+        # The csv, json, ndjson, xlsx and parquet writers at the same time, as a run writes them
+        writers = [
+            ('csv', None, {}, lambda: repackager.create_csv(conversation_name, messages, senders, output_folder / 'all.csv', attachments_folder, {})),
+            ('json', None, {}, lambda: repackager.create_json(conversation_name, messages, output_folder / 'all.json', {})),
+            ('ndjson', None, {}, lambda: repackager.create_json(conversation_name, messages, output_folder / 'all.ndjson', {}, ndjson=True)),
+            ('xlsx', None, {}, lambda: repackager.create_excel(conversation_name, messages, senders, output_folder / 'all.xlsx', attachments_folder, {}, summary_rows)),
+            ('parquet', None, {}, lambda: repackager.create_parquet(conversation_name, messages, output_folder / 'all.parquet', {})),
+        ]
+        def outputs():
+            profiler = repackager.StageProfiler()
+            repackager.write_outputs(writers, profiler)
+            # Forked writers report their own peak; together they show what the copies of the messages cost
+            fan_out = next((stage for stage in profiler.stages if stage['stage'] == 'write_outputs'), None)
+            if fan_out is not None and fan_out['processes']:
+                data['writer_peaks'] = [stage['process_peak_rss_mb'] for stage in profiler.stages if stage['stage'] != 'write_outputs']
+            return len(messages)
+        measure('outputs', outputs)
+
+    if 'pseudonymize' in stages:
+        def pseudonymize():
+            # Pseudonymized copy of the text plus a pseudonymized csv, as a pseudonymizing run writes them
+            repackager.pseudonymize = True
+            try:
+                pseudonym_mapping = repackager.create_pseudonym_mapping(senders)
+                repackager.create_pseudonymized_txt(txt_file, pseudonym_mapping, output_folder)
+                repackager.create_csv(conversation_name, messages, senders, output_folder / 'chat_pseudonymized.csv', attachments_folder, pseudonym_mapping)
+            finally:
+                repackager.pseudonymize = False
+            return len(messages)
+        measure('pseudonymize', pseudonymize)
+
+    return data.get('writer_peaks')
+
+def benchmark(zip_path, work_dir, stages, runs):
+    zip_path = Path(zip_path)
+    timings = {stage: [] for stage in STAGES}
+    peaks = {}
+    items = {}
+
+    def timed(stage, function):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        items[stage] = function()
+        timings[stage].append((time.perf_counter() - wall_start, time.process_time() - cpu_start))
+
+    def traced(stage, function):
+        tracemalloc.reset_peak()
+        function()
+        peaks[stage] = tracemalloc.get_traced_memory()[1]
+
+    writer_peaks = None
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        for _ in range(runs):
+            writer_peaks = run_pipeline(zip_path, work_dir, stages, timed)
+        # Memory is traced in a separate run, because tracing slows everything down
+        tracemalloc.start()
+        try:
+            run_pipeline(zip_path, work_dir, stages, traced)
+        finally:
+            tracemalloc.stop()
+
+    txt_size = zipfile.ZipFile(zip_path).getinfo(f"{zip_path.stem}.txt").file_size
+    report = {'zip': str(zip_path), 'zip_mb': round(zip_path.stat().st_size / 1e6, 2), 'txt_mb': round(txt_size / 1e6, 2), 'runs': runs, 'stages': {}}
+    for stage in STAGES:
+        if not timings[stage]:
+            continue
+        wall = statistics.median(timing[0] for timing in timings[stage])
+        cpu = statistics.median(timing[1] for timing in timings[stage])
+        report['stages'][stage] = {
+            'wall_s': round(wall, 4),
+            'cpu_s': round(cpu, 4),
+            'items': items[stage],
+            'items_per_s': round(items[stage] / wall) if wall else None,
+            'txt_mb_per_s': round(txt_size / 1e6 / wall, 2) if wall else None,
+            'peak_mb': round(peaks.get(stage, 0) / 1e6, 2),
+        }
+    if writer_peaks:
+        # Resident memory of the forked writer processes (not traced by tracemalloc), and of the largest child so far
+        report['stages']['outputs'].update(writer_processes=len(writer_peaks), writer_peak_rss_mb=max(writer_peaks), writer_peak_rss_sum_mb=round(sum(writer_peaks), 1), children_peak_rss_mb=repackager.peak_rss_mb(children=True))
+    report['process_peak_rss_mb'] = repackager.peak_rss_mb()
+    return report
+
+def print_report(report):
+    print(f"{report['zip']}: {report['zip_mb']} MB zip, {report['txt_mb']} MB chat text, median of {report['runs']} run(s)")
+    print(f"{'stage':<14}{'wall s':>10}{'cpu s':>10}{'items':>10}{'items/s':>12}{'txt MB/s':>10}{'peak MB':>10}")
+    for stage, result in report['stages'].items():
+        print(f"{stage:<14}{result['wall_s']:>10}{result['cpu_s']:>10}{result['items']:>10}{result['items_per_s']:>12}{result['txt_mb_per_s']:>10}{result['peak_mb']:>10}")
+    outputs = report['stages'].get('outputs', {})
+    if 'writer_processes' in outputs:
+        print(f"outputs: {outputs['writer_processes']} writer processes, peak RSS {outputs['writer_peak_rss_mb']} MB each at most, {outputs['writer_peak_rss_sum_mb']} MB summed over them (main process peak {report['process_peak_rss_mb']} MB)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the processing stages of whatsapp_repackager on a synthetic export.")
+    parser.add_argument('--zip', help="benchmark this export instead of generating one (its language must be given with --language)")
+    parser.add_argument('--stages', default=','.join(STAGES), help="comma separated stages to run (extract and parse always run): " + ", ".join(STAGES))
+    parser.add_argument('--runs', type=int, default=3, help="timed runs per stage (default: 3)")
+    parser.add_argument('--parse-workers', type=int, default=0, help="parse in chunks with this many processes (default: 0, in the main process)")
+    parser.add_argument('--output-workers', type=int, default=4, help="output files written at the same time in the outputs stage (default: 4)")
+    parser.add_argument('--emoji-descriptions', action='store_true', help="add emoji descriptions while parsing (offline Unicode names)")
+    parser.add_argument('--json', action='store_true', help="print the result as json")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    for stage in stages:
+        if stage not in STAGES:
+            parser.error(f"unknown stage: {stage}")
+
+    with tempfile.TemporaryDirectory() as temporary_folder:
+        work_dir = Path(temporary_folder)
+        repackager.configure(args.language, emoji_description=args.emoji_descriptions, parse_workers=args.parse_workers, output_workers=args.output_workers)
+        if args.emoji_descriptions:
+            # Build the emoji table once, offline, outside the timed stages
+            repackager.EMOJI_CACHE_FILE = work_dir / 'emoji_dict.json'
+            repackager.write_emoji_cache(repackager.EMOJI_CACHE_FILE, repackager.construct_offline_emoji_dict())
+            repackager.load_emoji_annotator()
+
+        zip_path = Path(args.zip) if args.zip else generate_export(work_dir / 'source' / 'WhatsApp Chat with Benchmark.zip', **generator_options(args))
+        report = benchmark(zip_path, work_dir, stages, args.runs)
+        report['generator'] = None if args.zip else generator_options(args)
+
+    if args.json:
+        print(json.dumps(report, indent=4))
+    else:
+        print_report(report)
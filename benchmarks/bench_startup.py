@@ -0,0 +1,112 @@
+""" Startup-time benchmark: times a cold 'import whatsapp_repackager' and a cold csv-only run, and checks that heavy dependencies stay unloaded. """
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from generate_export import generate_export
+
+# Modules that must only be imported when the feature that needs them is used
+HEAVY_MODULES = ['pandas', 'numpy', 'openpyxl', 'pyarrow', 'requests', 'shortuuid', 'slugify']
+# A csv-only run needs slugify, but none of the others
+CSV_RUN_HEAVY_MODULES = ['pandas', 'numpy', 'openpyxl', 'pyarrow', 'requests', 'shortuuid']
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import whatsapp_repackager
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(','.join(sorted(name for name in {heavy!r} if name in sys.modules)))
+"""
+
+CSV_RUN_PROBE = """
+import sys, time, io
+from contextlib import redirect_stdout
+start = time.perf_counter()
+import whatsapp_repackager
+whatsapp_repackager.configure('en', ['csv'])
+with redirect_stdout(io.StringIO()):
+    whatsapp_repackager.process_whatsapp_zip({zip_path!r}, False, overwrite=True, open_when_finished=False)
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(','.join(sorted(name for name in {heavy!r} if name in sys.modules)))
+"""
+
+def run_probe(probe, runs):
+    timings = []
+    loaded = set()
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', probe], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+        elapsed, modules = result.stdout.split('\n')[:2]
+        timings.append(float(elapsed))
+        loaded.update(name for name in modules.split(',') if name)
+    return timings, sorted(loaded)
+
+def measure_import(runs):
+    return run_probe(PROBE.format(heavy=HEAVY_MODULES), runs)
+
+def measure_csv_run(runs, messages):
+    # Import plus a full csv-only run on a small synthetic export, as a per-export job runner starts it
+    with tempfile.TemporaryDirectory() as temporary_folder:
+        zip_path = generate_export(Path(temporary_folder) / 'WhatsApp Chat with Startup.zip', messages=messages, attachments=10, attachment_size=1000)
+        return run_probe(CSV_RUN_PROBE.format(zip_path=str(zip_path), heavy=CSV_RUN_HEAVY_MODULES), runs)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the import time of whatsapp_repackager.")
+    parser.add_argument('--runs', type=int, default=10, help="number of cold imports to time (default: 10)")
+    parser.add_argument('--max-ms', type=float, default=None, help="fail when the median import time exceeds this many milliseconds")
+    parser.add_argument('--run-messages', type=int, default=5000, help="messages in the export of the csv-only run; 0 skips that run (default: 5000)")
+    parser.add_argument('--max-run-ms', type=float, default=None, help="fail when the median csv-only run time exceeds this many milliseconds")
+    parser.add_argument('--json', action='store_true', help="print the result as json")
+    args = parser.parse_args()
+
+    timings, loaded = measure_import(args.runs)
+    report = {
+        'runs': args.runs,
+        'import_median_ms': round(statistics.median(timings) * 1000, 2),
+        'import_min_ms': round(min(timings) * 1000, 2),
+        'import_max_ms': round(max(timings) * 1000, 2),
+        'heavy_modules_loaded': loaded,
+    }
+    run_loaded = []
+    if args.run_messages:
+        run_timings, run_loaded = measure_csv_run(args.runs, args.run_messages)
+        report.update({
+            'csv_run_messages': args.run_messages,
+            'csv_run_median_ms': round(statistics.median(run_timings) * 1000, 2),
+            'csv_run_min_ms': round(min(run_timings) * 1000, 2),
+            'csv_run_max_ms': round(max(run_timings) * 1000, 2),
+            'csv_run_heavy_modules_loaded': run_loaded,
+        })
+
+    if args.json:
+        print(json.dumps(report, indent=4))
+    else:
+        print(f"Import whatsapp_repackager: median {report['import_median_ms']} ms (min {report['import_min_ms']} ms, max {report['import_max_ms']} ms) over {args.runs} runs")
+        print(f"Heavy modules loaded at import: {', '.join(loaded) if loaded else 'none'}")
+        if args.run_messages:
+            print(f"Csv-only run of {args.run_messages} messages: median {report['csv_run_median_ms']} ms (min {report['csv_run_min_ms']} ms, max {report['csv_run_max_ms']} ms) over {args.runs} runs")
+            print(f"Heavy modules loaded by the csv-only run: {', '.join(run_loaded) if run_loaded else 'none'}")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: heavy modules are imported at startup: {', '.join(loaded)}")
+        failed = True
+    if args.max_ms is not None and report['import_median_ms'] > args.max_ms:
+        print(f"FAIL: median import time {report['import_median_ms']} ms exceeds {args.max_ms} ms")
+        failed = True
+    if run_loaded:
+        print(f"FAIL: the csv-only run imports: {', '.join(run_loaded)}")
+        failed = True
+    if args.max_run_ms is not None and args.run_messages and report['csv_run_median_ms'] > args.max_run_ms:
+        print(f"FAIL: median csv-only run time {report['csv_run_median_ms']} ms exceeds {args.max_run_ms} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,155 @@
+""" Synthetic WhatsApp export generator: writes a zip that looks like a real 'Export chat' with configurable size and content. """
+
+import argparse
+import random
+import zipfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+FIRST_NAMES = ['Jan', 'Marie', 'Ahmed', 'Sofie', 'Luca', 'Emma', 'Noah', 'Fatima', 'Lars', 'Giulia', 'Pieter', 'Ana', 'Tom', 'Lotte', 'Yusuf', 'Eva']
+LAST_NAMES = ['Peeters', 'Janssens', 'Maes', 'Rossi', 'De Smet', 'Bianchi', 'Willems', 'Claes', 'Silva', 'Goossens']
+WORDS = ("de het een en van ik je dat is niet op te zijn met voor maar ook wat als er nog bij morgen vandaag "
+         "kom ga wil heb weet foto film eten trein regen zon feest werk school straks later oké haha ja nee").split()
+EMOJIS = ['😀', '😂', '👍', '👍🏽', '❤️', '🎉', '😢', '🙏', '🔥', '👨‍👩‍👧', '🇧🇪', '☀️', '🍕', '✅']
+ATTACHMENT_KINDS = [('IMG', 'jpg'), ('VID', 'mp4'), ('AUD', 'opus'), ('PTT', 'opus'), ('DOC', 'pdf'), ('STK', 'webp')]
+
+# Timestamp layouts as written by the app, matching DATETIME_FORMATS in the script
+def format_nl(moment):
+    return f"{moment:%d/%m/%Y} {moment.hour}:{moment:%M}"
+
+def format_it(moment):
+    return f"{moment:%d/%m/%y}, {moment:%H:%M}"
+
+def format_en(moment):
+    return f"{moment.month}/{moment.day}/{moment:%y}, {moment.hour % 12 or 12}:{moment:%M} {moment:%p}"
+
+DATE_FORMATS = {'nl': format_nl, 'it': format_it, 'en': format_en}
+
+# Per interface language, the texts as they appear in exports: the encryption notice on the first line, the marker
+# after an attachment's file name, the deleted-message texts and the timestamp layout. They are written out here
+# rather than taken from the script's own tables, so the benchmarks notice when those tables drift from real exports.
+# DE, ES, IT and PT are not confirmed against real exports; German exports write dates with dots (dd.mm.yy), which the
+# script doesn't read, so they use the Italian layout here.
+EXPORT_FORMATS = {
+    'en': ("Messages and calls are end-to-end encrypted. No one outside of this chat, not even WhatsApp, can read or listen to them. Tap to learn more.",
+           "file attached", ["This message was deleted", "You deleted this message"], 'en'),
+    'fr': ("Les messages et les appels sont chiffrés de bout en bout. Aucun tiers, pas même WhatsApp, ne peut les lire ou les écouter. Appuyez pour en savoir plus.",
+           "fichier joint", ["Ce message a été supprimé", "Vous avez supprimé ce message"], 'nl'),
+    'nl': ("Berichten en gesprekken worden end-to-end versleuteld. Niemand buiten deze chat, zelfs WhatsApp niet, kan ze lezen of beluisteren. Tik voor meer informatie.",
+           "bestand bijgevoegd", ["Dit bericht is verwijderd", "U hebt dit bericht verwijderd"], 'nl'),
+    'de': ("Nachrichten und Anrufe sind Ende-zu-Ende-verschlüsselt. Niemand außerhalb dieses Chats kann sie lesen oder anhören, nicht einmal WhatsApp. Tippe, um mehr zu erfahren.",
+           "Dateianhang", ["Diese Nachricht wurde gelöscht", "Sie haben diese Nachricht gelöscht"], 'it'),
+    'es': ("Los mensajes y las llamadas están cifrados de extremo a extremo. Nadie fuera de este chat, ni siquiera WhatsApp, puede leerlos ni escucharlos. Toca para obtener más información.",
+           "archivo adjunto", ["Este mensaje fue eliminado", "Has eliminado este mensaje"], 'it'),
+    'it': ("I messaggi e le chiamate sono crittografati end-to-end. Nessuno al di fuori di questa chat, nemmeno WhatsApp, può leggerli o ascoltarli. Tocca per saperne di più.",
+           "file allegato", ["Questo messaggio è stato eliminato", "Hai eliminato questo messaggio"], 'it'),
+    'pt': ("As mensagens e as chamadas são protegidas com a criptografia de ponta a ponta e ficam somente entre você e os participantes desta conversa. Nem mesmo o WhatsApp pode ler ou ouvi-las. Toque para saber mais.",
+           "arquivo anexado", ["Esta mensagem foi apagada", "Você apagou esta mensagem"], 'nl'),
+}
+
+def make_participants(count, rng):
+    # Unique full names; the first participant's first name is also used alone, so name prefixes occur as in real chats
+    names = []
+    while len(names) < count:
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        if name not in names:
+            names.append(name)
+    if count > 1:
+        names[-1] = names[0].split(' ')[0]
+    return names
+
+def make_text(rng, participants, emoji_density):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(2, 18))]
+    if rng.random() < 0.1:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(participants))
+    for index in range(len(words)):
+        if rng.random() < emoji_density:
+            words[index] += ' ' + rng.choice(EMOJIS)
+    return ' '.join(words)
+
+def generate_export(zip_path, messages=10000, participants=5, multiline_ratio=0.05, emoji_density=0.05, attachments=100,
+                    attachment_size=50000, duplicate_ratio=0.0, deleted_ratio=0.01, language='en', date_format=None, seed=1):
+    # Returns the path of the written zip; the chat is named after the zip, as WhatsApp does
+    zip_path = Path(zip_path)
+    zip_path.parent.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    encryption_notice, attachment_indicator, deleted_message_warnings, language_date_format = EXPORT_FORMATS[language.lower()]
+    format_moment = DATE_FORMATS[(date_format or language_date_format).lower()]
+    names = make_participants(participants, rng)
+
+    # Spread the attachments over the chat
+    attachment_positions = set(rng.sample(range(1, messages), min(attachments, max(messages - 1, 0))))
+    attachment_files = []
+
+    lines = []
+    moment = datetime(2019, 1, 1, 8, 0)
+    lines.append(f"{format_moment(moment)} - {encryption_notice}\n")
+    for index in range(messages):
+        # Bursts of messages in the same minute, with pauses in between
+        moment += timedelta(minutes=rng.choice([0, 0, 0, 1, 2, 5, 30, 240]))
+        sender = rng.choice(names)
+        if index in attachment_positions:
+            kind, extension = rng.choice(ATTACHMENT_KINDS)
+            file_name = f"{kind}-{moment:%Y%m%d}-WA{len(attachment_files):04d}.{extension}"
+            attachment_files.append(file_name)
+            text = f"{file_name} ({attachment_indicator})"
+            if rng.random() < 0.3:
+                text += "\n" + make_text(rng, names, emoji_density)
+        elif rng.random() < deleted_ratio:
+            text = rng.choice(deleted_message_warnings)
+        else:
+            text = make_text(rng, names, emoji_density)
+            while rng.random() < multiline_ratio:
+                text += "\n" + make_text(rng, names, emoji_density)
+        lines.append(f"{format_moment(moment)} - {sender}: {text}\n")
+
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        zip_ref.writestr(f"{zip_path.stem}.txt", ''.join(lines))
+        # Media doesn't compress, so it is stored; forwarded media reappears as an identical copy
+        blobs = []
+        for file_name in attachment_files:
+            if blobs and rng.random() < duplicate_ratio:
+                content = rng.choice(blobs)
+            else:
+                content = rng.randbytes(max(1, int(rng.uniform(0.5, 1.5) * attachment_size)))
+                blobs.append(content)
+            zip_ref.writestr(zipfile.ZipInfo(file_name, date_time=(2019, 1, 1, 0, 0, 0)), content, compress_type=zipfile.ZIP_STORED)
+
+    return zip_path
+
+def add_generator_arguments(parser):
+    parser.add_argument('--messages', type=int, default=10000, help="number of messages (default: 10000)")
+    parser.add_argument('--participants', type=int, default=5, help="number of participants (default: 5)")
+    parser.add_argument('--multiline-ratio', type=float, default=0.05, help="chance that a message continues on another line (default: 0.05)")
+    parser.add_argument('--emoji-density', type=float, default=0.05, help="chance of an emoji after each word (default: 0.05)")
+    parser.add_argument('--attachments', type=int, default=100, help="number of attachments (default: 100)")
+    parser.add_argument('--attachment-size', type=int, default=50000, help="average attachment size in bytes (default: 50000)")
+    parser.add_argument('--duplicate-ratio', type=float, default=0.0, help="share of attachments that repeat an earlier file (default: 0)")
+    parser.add_argument('--deleted-ratio', type=float, default=0.01, help="share of deleted messages (default: 0.01)")
+    parser.add_argument('--language', default='en', help="interface language: " + ", ".join(EXPORT_FORMATS) + " (default: en)")
+    parser.add_argument('--date-format', choices=sorted(DATE_FORMATS), help="timestamp layout (default: the one the language's exports use)")
+    parser.add_argument('--seed', type=int, default=1, help="random seed, for reproducible exports (default: 1)")
+
+def generator_options(args):
+    return {
+        'messages': args.messages,
+        'participants': args.participants,
+        'multiline_ratio': args.multiline_ratio,
+        'emoji_density': args.emoji_density,
+        'attachments': args.attachments,
+        'attachment_size': args.attachment_size,
+        'duplicate_ratio': args.duplicate_ratio,
+        'deleted_ratio': args.deleted_ratio,
+        'language': args.language,
+        'date_format': args.date_format,
+        'seed': args.seed,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic WhatsApp zip export.")
+    parser.add_argument('zip_path', help="zip file to write, e.g. 'WhatsApp Chat met Test.zip'")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    zip_path = generate_export(args.zip_path, **generator_options(args))
+    print(f"Wrote '{zip_path}' ({zip_path.stat().st_size / 1e6:.1f} MB)")
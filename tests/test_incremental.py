@@ -0,0 +1,61 @@
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / 'benchmarks'))
+
+import whatsapp_repackager as repackager
+from generate_export import generate_export
+
+def truncated_export(zip_path, destination, skipped_lines):
+    # The same chat, re-exported without its first lines (as when an export is capped at recent messages)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(zip_path) as source, zipfile.ZipFile(destination, 'w') as target:
+        for member in source.infolist():
+            content = source.read(member)
+            if member.filename.endswith('.txt'):
+                content = b''.join(content.splitlines(keepends=True)[skipped_lines:])
+            target.writestr(member, content)
+    return destination
+
+@pytest.fixture
+def processed_export(tmp_path):
+    repackager.configure('en', ['csv'])
+    zip_path = generate_export(tmp_path / 'first' / 'WhatsApp Chat with Test.zip', messages=1000, attachments=5, attachment_size=100)
+    output_folder = tmp_path / 'output'
+    repackager.process_whatsapp_zip(zip_path, False, overwrite=False, open_when_finished=False, output_folder=output_folder)
+    return zip_path, output_folder
+
+def folder_contents(folder):
+    return {path.relative_to(folder): path.read_bytes() for path in sorted(folder.rglob('*')) if path.is_file()}
+
+def test_mismatched_update_leaves_the_folder_untouched(processed_export, tmp_path):
+    zip_path, output_folder = processed_export
+    before = folder_contents(output_folder)
+    truncated = truncated_export(zip_path, tmp_path / 'second' / zip_path.name, 500)
+
+    with pytest.raises(FileExistsError):
+        repackager.process_whatsapp_zip(truncated, False, overwrite=False, open_when_finished=False, incremental=True, output_folder=output_folder)
+    assert folder_contents(output_folder) == before
+
+def test_mismatched_update_fails_the_batch_job(processed_export, tmp_path):
+    zip_path, output_folder = processed_export
+    before = folder_contents(output_folder)
+    truncated = truncated_export(zip_path, tmp_path / 'second' / zip_path.name, 500)
+
+    job = {'zip': str(truncated), 'config': {'language': 'en', 'file_types': ['csv']}, 'overwrite': False, 'incremental': True, 'output': str(output_folder)}
+    result = repackager.run_batch_job(job)
+    assert not result['ok']
+    assert 'FileExistsError' in result['error']
+    assert folder_contents(output_folder) == before
+
+def test_mismatched_update_rebuilds_with_overwrite(processed_export, tmp_path):
+    zip_path, output_folder = processed_export
+    truncated = truncated_export(zip_path, tmp_path / 'second' / zip_path.name, 500)
+
+    repackager.process_whatsapp_zip(truncated, False, overwrite=True, open_when_finished=False, incremental=True, output_folder=output_folder)
+    assert repackager.read_manifest(output_folder)['message_count'] < 1000
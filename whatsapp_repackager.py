@@ -1,69 +1,438 @@
+# Heavy dependencies (openpyxl, pandas, pyarrow, requests, shortuuid, python-slugify) are imported inside the functions
+# that need them, so runs that don't use a feature don't pay for loading it.
 import zipfile
 import csv
+import io
+import sys
 import json
 import re
 import os
 import shutil
-import requests
-import pandas as pd
-import shortuuid
-import openpyxl
-from openpyxl.styles import PatternFill, Font
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.chart import PieChart, Reference
+import time
+import unicodedata
+import hashlib
+import threading
 from pathlib import Path
-from slugify import slugify
 from datetime import datetime
-from collections import defaultdict
+from array import array
+from itertools import chain, islice
+from functools import lru_cache
+from contextlib import redirect_stdout, contextmanager
 
 """"""""""""""""""""" PARAMETERS TO ADJUST """""""""""""""""""""
 
 EMOJIDESCRIPTION = 'Ask'  # Options: 'Yes' (add descriptions for emoji) / 'No' (don't add descriptions for emoji) / 'Ask' (choose each time you run the script)
 API_KEY = 'Ask'           # Options: '[your API-key]' (get it for free at https://emoji-api.com/) / 'Ask' (choose each time you run the script)
-LANGUAGE = 'Ask'          # Options: 'en', 'fr', 'nl', 'de', 'es', 'it', 'pt' (language of the application at the time of export) / 'Ask' (choose each time you run the script)
+LANGUAGE = 'Auto'         # Options: 'en', 'fr', 'nl', 'de', 'es', 'it', 'pt' (language of the application at the time of export) / 'Auto' (detect it from the export, ask when that fails) / 'Ask' (choose each time you run the script)
 PSYDONYMIZE = 'Ask'       # Options: 'Yes' (to use participants's real names in all output files) / 'No' (to use pseudonymes all output files - the original txt-file will not be modified) / 'Ask' (choose each time you run the script)
-FILE_TYPES = 'Ask'        # Options: 'csv', 'xlsx', 'json' / a combination separated by comma's like 'csv, xlsx, json'/ 'Ask' (choose each time you run the script)
+FILE_TYPES = 'Ask'        # Options: 'csv', 'xlsx', 'json', 'ndjson', 'sqlite', 'parquet' / a combination separated by comma's like 'csv, xlsx, json'/ 'Ask' (choose each time you run the script)
 OPEN_WHEN_FINISHED = 'Ask'# Options: 'Yes' (open the output folder on completion) / 'No' (don't open the output folder on completion) / 'Ask' (choose each time you run the script)
+DEDUPLICATE_ATTACHMENTS = 'No' # Options: 'Yes' (store identical attachments once and hardlink the other copies) / 'No' (store every copy) / 'Ask' (choose each time you run the script)
+WRITE_ACTIVITY_TABLES = 'No'   # Options: 'Yes' (also write the activity tables as csv files) / 'No' (only add them to the Excel file, when one is made) / 'Ask' (choose each time you run the script)
 
 """"""""""""""""""""""""""""""""""""""""""""""""""""""""""""
 
+ALLOWED_FILE_TYPES = ['csv', 'xlsx', 'json', 'ndjson', 'sqlite', 'parquet']
+
+# Attachment indicator and deleted message warnings per interface language
+LANGUAGE_SETTINGS = {
+    'EN': ("file attached", ["This message was deleted", "You deleted this message"]),  # Translation confirmed 28.8.2024
+    'FR': ("fichier joint", ["Ce message a été supprimé", "Vous avez supprimé ce message"]),  # Translation confirmed 28.8.2024
+    'NL': ("bestand bijgevoegd", ["Dit bericht is verwijderd", "U hebt dit bericht verwijderd"]),  # Translation confirmed 28.8.2024
+    'DE': ("Dateianhang", ["Diese Nachricht wurde gelöscht", "Sie haben diese Nachricht gelöscht"]),  # Translation not confirmed
+    'ES': ("archivo adjunto", ["Este mensaje fue eliminado", "Has eliminado este mensaje"]),  # Translation not confirmed
+    'IT': ("file allegato", ["Questo messaggio è stato eliminato", "Hai eliminato questo messaggio"]),  # Translation not confirmed
+    'PT': ("arquivo anexado", ["Esta mensagem foi apagada", "Você apagou esta mensagem"]),  # Translation not confirmed
+}
+
+# First line of every export, in the interface language; used to detect the language
+ENCRYPTION_NOTICES = {
+    'EN': "Messages and calls are end-to-end encrypted",
+    'FR': "Les messages et les appels sont chiffrés de bout en bout",
+    'NL': "Berichten en gesprekken worden end-to-end versleuteld",
+    'DE': "Nachrichten und Anrufe sind Ende-zu-Ende-verschlüsselt",
+    'ES': "Los mensajes y las llamadas están cifrados de extremo a extremo",
+    'IT': "I messaggi e le chiamate sono crittografati end-to-end",
+    'PT': "As mensagens e as chamadas são protegidas com a criptografia de ponta a ponta",
+}
+
+# Run configuration used by the processing functions; set by configure() or by the interactive prompts
+message_pattern = re.compile(r"(\d{1,2}/\d{1,2}/\d{2,4},?\s*\d{1,2}:\d{2}\s*([ap]m\s)?)- (.+?): (.+)", re.IGNORECASE)
+language = 'EN'
+attachment_indicator, deleted_message_warnings = LANGUAGE_SETTINGS[language]
+file_types = ['csv', 'xlsx', 'json']
+pseudonymize = False
+emoji_description = False
+api_key = ""
+deduplicate_attachments = False
+activity_tables = False  # Write the activity tables as CSV files; with xlsx they are computed for the Summary sheet anyway
+attachment_workers = 4  # Threads placing attachments while the chat is parsed; 0 places them inline
+parse_workers = 0  # Processes parsing large chats in chunks; 0 or 1 parses in the main process
+output_workers = 4  # Output files written at the same time from the parsed messages; 0 or 1 writes them one after another
+sqlite_archive = None  # Path of a shared SQLite database that every processed conversation is also loaded into
+
+def configure(language, file_types=('csv', 'xlsx', 'json'), pseudonymize=False, emoji_description=False, api_key="", deduplicate_attachments=False, attachment_workers=4, sqlite_archive=None, parse_workers=0, output_workers=4, activity_tables=False):
+    # Set the module-wide run configuration, e.g. at the start of a batch job in a worker process
+    global attachment_indicator, deleted_message_warnings
+    language = language.strip().upper()
+    if language not in LANGUAGE_SETTINGS:
+        raise ValueError(f"Unsupported language code: {language}")
+    file_types = [file_type.strip().lower() for file_type in file_types]
+    for file_type in file_types:
+        if file_type not in ALLOWED_FILE_TYPES:
+            raise ValueError(f"Unsupported file type: {file_type}")
+
+    attachment_indicator, deleted_message_warnings = LANGUAGE_SETTINGS[language]
+    globals().update(language=language, file_types=file_types, pseudonymize=pseudonymize, emoji_description=emoji_description, api_key=api_key, deduplicate_attachments=deduplicate_attachments, attachment_workers=attachment_workers, sqlite_archive=sqlite_archive, parse_workers=parse_workers, output_workers=output_workers, activity_tables=activity_tables)
+
+ZIP_COPY_BUFFER_SIZE = 1024 * 1024
+
 def extract_zip(zip_path, output_folder):
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
         zip_ref.extractall(output_folder)
 
+def index_zip_attachments(zip_ref, txt_name):
+    # Index every attachment by its original name, using only the central directory
+    return AttachmentIndex(
+        (member.filename, slugify_filename(member.filename), member)
+        for member in zip_ref.infolist()
+        if not (member.is_dir() or '/' in member.filename or member.filename == txt_name)
+    )
+
+def extract_zip_member(zip_ref, member, destination_path):
+    with zip_ref.open(member) as source, open(destination_path, 'wb') as destination:
+        shutil.copyfileobj(source, destination, ZIP_COPY_BUFFER_SIZE)
+
+ATTACHMENT_HASH_WORKERS = min(8, os.cpu_count() or 1)
+
+def find_duplicate_candidates(members):
+    # Only files that share their size and CRC-32 with another file can be identical; the others are never hashed
+    groups = {}
+    for member in members:
+        groups.setdefault((member.file_size, member.CRC), []).append(member)
+    return [member for group in groups.values() if len(group) > 1 for member in group]
+
+class ZipHandles:
+    # One ZipFile handle per thread on the same zip. A ZipFile shares a single file object between its open members
+    # and serializes their reads with a lock, so threads streaming through one handle take turns instead of reading
+    # (and inflating) in parallel. Hashing and attachment placement both read members from pool threads this way.
+    __slots__ = ('zip_path', 'local', 'handles', 'lock')
+
+    def __init__(self, zip_path):
+        self.zip_path = zip_path
+        self.local = threading.local()
+        self.handles = []
+        self.lock = threading.Lock()
+
+    def get(self):
+        zip_ref = getattr(self.local, 'zip_ref', None)
+        if zip_ref is None:
+            zip_ref = self.local.zip_ref = zipfile.ZipFile(self.zip_path, 'r')
+            with self.lock:
+                self.handles.append(zip_ref)
+        return zip_ref
+
+    def close(self):
+        with self.lock:
+            handles, self.handles = self.handles, []
+        for zip_ref in handles:
+            zip_ref.close()
+
+def hash_zip_members(zip_path, members, workers=None):
+    # sha256 of each member's content, hashed in parallel (zlib and hashlib release the GIL)
+    from concurrent.futures import ThreadPoolExecutor
+
+    handles = ZipHandles(zip_path)
+
+    def digest(member):
+        content_hash = hashlib.sha256()
+        with handles.get().open(member) as source:
+            for chunk in iter(lambda: source.read(ZIP_COPY_BUFFER_SIZE), b''):
+                content_hash.update(chunk)
+        return member.filename, content_hash.hexdigest()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers or ATTACHMENT_HASH_WORKERS) as executor:
+            return dict(executor.map(digest, members))
+    finally:
+        handles.close()
+
+class AttachmentDeduplicator:
+    # Places attachments from the zip so that identical files are stored once; the other copies are hardlinks to the first.
+    # place() may be called from several threads at once.
+    __slots__ = ('digests', 'stored', 'lock', 'files', 'unique_files', 'total_bytes', 'stored_bytes')
+
+    def __init__(self, digests):
+        self.digests = digests  # zip member name -> sha256, only for members that may have a duplicate
+        self.stored = {}  # sha256 -> (path of the stored copy, event set once it is written)
+        self.lock = threading.Lock()
+        self.files = 0
+        self.unique_files = 0
+        self.total_bytes = 0
+        self.stored_bytes = 0
+
+    @classmethod
+    def for_zip(cls, zip_path, members, workers=None):
+        return cls(hash_zip_members(zip_path, find_duplicate_candidates(members), workers))
+
+    def place(self, zip_ref, member, destination_path):
+        digest = self.digests.get(member.filename)
+        written = None
+        with self.lock:
+            self.files += 1
+            self.total_bytes += member.file_size
+            stored = self.stored.get(digest) if digest else None
+            if digest and stored is None:
+                written = threading.Event()
+                self.stored[digest] = (destination_path, written)
+
+        if stored is not None:
+            stored_path, stored_written = stored
+            stored_written.wait()
+            try:
+                os.link(stored_path, destination_path)
+                return
+            except OSError:
+                pass  # No hardlinks on this filesystem: store another copy
+
+        try:
+            extract_zip_member(zip_ref, member, destination_path)
+        finally:
+            if written is not None:
+                written.set()
+        with self.lock:
+            self.unique_files += 1
+            self.stored_bytes += member.file_size
+
+    def to_dict(self):
+        return {'files': self.files, 'unique_files': self.unique_files, 'total_bytes': self.total_bytes, 'stored_bytes': self.stored_bytes}
+
+    def add_counts(self, data):
+        # Counts from an earlier run, e.g. when an output folder is updated incrementally
+        self.files += data['files']
+        self.unique_files += data['unique_files']
+        self.total_bytes += data['total_bytes']
+        self.stored_bytes += data['stored_bytes']
+
+    def summary_rows(self):
+        return [
+            ['AttachmentFiles', self.files],
+            ['UniqueAttachmentFiles', self.unique_files],
+            ['AttachmentDedupeRatio', round(self.files / self.unique_files, 2) if self.unique_files else 1.0],
+            ['AttachmentBytesSaved', self.total_bytes - self.stored_bytes],
+        ]
+
+class AttachmentPlacer:
+    # Runs attachment placement (mkdir, extract, move) on a small thread pool while parsing continues.
+    # At most max_pending placements wait at a time; workers < 1 places everything inline.
+    def __init__(self, workers, max_pending=None):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.executor = ThreadPoolExecutor(max_workers=workers) if workers >= 1 else None
+        self.slots = threading.BoundedSemaphore(max_pending or max(workers, 1) * 4)
+        self.tasks = []  # (description, future), in the order the placements were submitted
+
+    def submit(self, description, function, *args):
+        from concurrent.futures import Future
+
+        if self.executor is None:
+            future = Future()
+            try:
+                future.set_result(function(*args))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            self.slots.acquire()
+            future = self.executor.submit(function, *args)
+            future.add_done_callback(lambda _: self.slots.release())
+        self.tasks.append((description, future))
+
+    def finish(self):
+        # Waits for every placement, then reports the failures in submission order and raises the first one
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+        errors = [(description, future.exception()) for description, future in self.tasks if future.exception() is not None]
+        for description, error in errors:
+            print(f"\u2717 Could not place attachments in '{description}': {type(error).__name__}: {error}")
+        if errors:
+            raise errors[0][1]
+
+@lru_cache(maxsize=None)
+def compile_attachment_pattern(indicator):
+    # Finds 'name (indicator)' references in a message; compiled once per language
+    return re.compile(r"([\S ]+)\s\(" + re.escape(indicator) + r"\)")
+
 def clean_message_text(text):
     return text.replace("â€Ž", "").strip()
 
-def construct_emoji_dict():
-    API_URL = 'https://emoji-api.com/emojis?access_key={}'
-    response = requests.get(API_URL.format(api_key))
-    if response.status_code == requests.codes.ok:
+EMOJI_API_URL = 'https://emoji-api.com/emojis?access_key={}'
+EMOJI_API_TIMEOUT = 30  # Seconds
+EMOJI_CACHE_FILE = Path.home() / '.cache' / 'whatsapp_repackager' / 'emoji_dict.json'
+EMOJI_CACHE_VERSION = 1
+EMOJI_CACHE_TTL = 30 * 24 * 60 * 60  # Seconds
+
+# Unicode blocks used to build the offline emoji table
+EMOJI_RANGES = [
+    ('\U0001F600', '\U0001F64F'),
+    ('\U0001F300', '\U0001F5FF'),
+    ('\U0001F680', '\U0001F6FF'),
+    ('\U0001F700', '\U0001F77F'),
+    ('\U0001F780', '\U0001F7FF'),
+    ('\U0001F800', '\U0001F8FF'),
+    ('\U0001F900', '\U0001F9FF'),
+    ('\U0001FA00', '\U0001FA6F'),
+    ('\U0001FA70', '\U0001FAFF'),
+    ('\U00002700', '\U000027BF'),
+    ('\U00002600', '\U000026FF'),
+    ('\U00002B00', '\U00002BFF'),
+    ('\U0001F100', '\U0001F251'),
+]
+
+_emoji_dict = None
+_emoji_annotator = None
+
+def normalize_emoji_name(unicode_name):
+    # The emoji API prefixes names with the emoji version, e.g. 'E0.6 grinning face'
+    return re.sub(r'^E\d+\.\d+\s+', '', unicode_name)
+
+def fetch_emoji_dict(api_key, source):
+    # The source is either the API url template or a local file in the same format (handy for tests)
+    if re.match(r'^https?://', source):
+        import requests
+        response = requests.get(source.format(api_key), timeout=EMOJI_API_TIMEOUT)
+        response.raise_for_status()
         data = response.json()
-        emoji_dict = {item['character']: item['unicodeName'] for item in data}
-        return emoji_dict
-
-def add_emoji_names(emoji_dict, text):
-    emoji_pattern = re.compile(
-        u'[\U0001F600-\U0001F64F|'
-        u'\U0001F300-\U0001F5FF|'
-        u'\U0001F680-\U0001F6FF|'
-        u'\U0001F700-\U0001F77F|'
-        u'\U0001F780-\U0001F7FF|'
-        u'\U0001F800-\U0001F8FF|'
-        u'\U0001F900-\U0001F9FF|'
-        u'\U0001FA00-\U0001FA6F|'
-        u'\U0001FA70-\U0001FAFF|'
-        u'\U00002700-\U000027BF|'
-        u'\U000024C2-\U0001F251]', re.UNICODE)
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    return {item['character']: normalize_emoji_name(item['unicodeName']) for item in data}
+
+def read_emoji_cache(cache_file):
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cache, dict) or cache.get('version') != EMOJI_CACHE_VERSION:
+        return None
+    return cache
+
+def write_emoji_cache(cache_file, emoji_dict):
+    cache_file = Path(cache_file)
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': EMOJI_CACHE_VERSION, 'created': time.time(), 'emojis': emoji_dict}, f, ensure_ascii=False)
+        os.replace(temp_file, cache_file)
+    except OSError as e:
+        print(f"Warning: could not write the emoji cache '{cache_file}': {e}")
+
+def construct_offline_emoji_dict():
+    # Names from the Unicode database; covers single code points only
+    emoji_dict = {}
+    for start, end in EMOJI_RANGES:
+        for code_point in range(ord(start), ord(end) + 1):
+            character = chr(code_point)
+            if unicodedata.category(character) == 'So':
+                name = unicodedata.name(character, None)
+                if name:
+                    emoji_dict[character] = name.lower()
+    return emoji_dict
+
+def load_emoji_dict(api_key='', source=None, cache_file=None, ttl=None):
+    global _emoji_dict
+    if _emoji_dict is not None:
+        return _emoji_dict
+
+    source = source or EMOJI_API_URL
+    cache_file = cache_file or EMOJI_CACHE_FILE
+    ttl = EMOJI_CACHE_TTL if ttl is None else ttl
+
+    # Use the on-disk cache while it is fresh
+    cache = read_emoji_cache(cache_file)
+    if cache and time.time() - cache.get('created', 0) < ttl:
+        _emoji_dict = cache['emojis']
+        return _emoji_dict
+
+    try:
+        _emoji_dict = fetch_emoji_dict(api_key, source)
+        write_emoji_cache(cache_file, _emoji_dict)
+    except (OSError, ValueError, KeyError, TypeError) as e:  # requests.RequestException is an OSError
+        # Fall back to a stale cache, and to the Unicode database when there is none
+        if cache:
+            print(f"Warning: could not refresh the emoji descriptions ({e}). Using the cached copy.")
+            _emoji_dict = cache['emojis']
+        else:
+            print(f"Warning: could not download the emoji descriptions ({e}). Using the offline Unicode names.")
+            _emoji_dict = construct_offline_emoji_dict()
+    return _emoji_dict
+
+def build_character_class(characters):
+    # Collapse the characters into ranges; re handles long lists of astral literals slowly
+    code_points = sorted({ord(character) for character in characters})
+    ranges = []
+    for code_point in code_points:
+        if ranges and code_point == ranges[-1][1] + 1:
+            ranges[-1][1] = code_point
+        else:
+            ranges.append([code_point, code_point])
+    return '[' + ''.join(re.escape(chr(start)) + ('-' + re.escape(chr(end)) if end > start else '') for start, end in ranges) + ']'
+
+def build_trie(words):
+    trie = {}
+    for word in words:
+        node = trie
+        for character in word:
+            node = node.setdefault(character, {})
+        node[''] = True
+    return trie
+
+def build_trie_pattern(node):
+    # Turn a character trie into nested alternations; the greedy '?' makes longer matches win
+    leaves = [character for character, child in node.items() if character and child == {'': True}]
+    alternatives = [re.escape(character) + build_trie_pattern(child) for character, child in sorted(node.items()) if character and character not in leaves]
+    if leaves:
+        alternatives.append(build_character_class(leaves))
+    if not alternatives:
+        return ''
+    pattern = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+    if '' in node:
+        if len(alternatives) == 1:
+            pattern = '(?:' + pattern + ')'
+        pattern += '?'
+    return pattern
+
+def build_emoji_annotator(emoji_dict):
+    names = dict(emoji_dict)
+
+    # Also recognize emoji typed without the variation selector
+    for emoji, name in emoji_dict.items():
+        if emoji.endswith('\uFE0F') and len(emoji) > 1:
+            names.setdefault(emoji[:-1], name)
+
+    emoji_pattern = re.compile(build_trie_pattern(build_trie(names))) if names else None
+
+    # Every emoji sequence contains at least one non-ASCII character from this set
+    precheck_characters = {character for emoji in names for character in emoji if ord(character) > 127}
+    precheck_pattern = re.compile(build_character_class(precheck_characters)) if precheck_characters else None
 
     def replace(match):
         emoji = match.group(0)
-        name = emoji_dict.get(emoji, None)
-        if name:
-            return f'{emoji} [{name[5:]}]'
-        return emoji
+        return f'{emoji} [{names[emoji]}]'
+
+    def annotate(text):
+        if emoji_pattern is None or text.isascii() or not precheck_pattern.search(text):
+            return text
+        return emoji_pattern.sub(replace, text)
 
-    return emoji_pattern.sub(replace, text)
+    return annotate
+
+def load_emoji_annotator(api_key=''):
+    global _emoji_annotator
+    if _emoji_annotator is None:
+        _emoji_annotator = build_emoji_annotator(load_emoji_dict(api_key))
+    return _emoji_annotator
 
 def preprocess_datetime(datetime_str):
     parts = datetime_str.split(' ')
@@ -77,170 +446,541 @@ def preprocess_datetime(datetime_str):
     except IndexError:
         return f"{parts[0]} {time_part}"
 
+DATETIME_FORMATS = [
+    '%d/%m/%Y %H:%M',      # Day/Month/Year Hour:Minute = NL pattern
+    '%d/%m/%y, %H:%M',     # Day/Month/Year Hour:Minute = IT pattern
+    '%m/%d/%y, %I:%M %p',  # Month/Day/Year, Hour:Minute AM/PM = EN pattern
+]
+
+# Compiled equivalents of DATETIME_FORMATS, matched against the stripped datetime string
+DATETIME_FAST_PATTERNS = {
+    '%d/%m/%Y %H:%M': re.compile(r"(?P<day>\d{1,2})/(?P<month>\d{1,2})/(?P<year>\d{4}) (?P<hour>\d{1,2}):(?P<minute>\d{2})"),
+    '%d/%m/%y, %H:%M': re.compile(r"(?P<day>\d{1,2})/(?P<month>\d{1,2})/(?P<year>\d{2}), (?P<hour>\d{1,2}):(?P<minute>\d{2})"),
+    '%m/%d/%y, %I:%M %p': re.compile(r"(?P<month>\d{1,2})/(?P<day>\d{1,2})/(?P<year>\d{2}), (?P<hour>\d{1,2}):(?P<minute>\d{2}) (?P<ampm>[ap]m)", re.IGNORECASE),
+}
+
+DATETIME_SAMPLE_SIZE = 50
+
+def parse_datetime_slow(datetime_str):
+    formatted_str = preprocess_datetime(datetime_str.strip())
+    for fmt in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(formatted_str, fmt)
+        except ValueError:
+            continue
+    return None
+
+def detect_datetime_format(datetime_strs):
+    # Pick the format that parses most of the sampled timestamps (earlier formats win ties)
+    formatted_strs = [preprocess_datetime(datetime_str.strip()) for datetime_str in datetime_strs]
+    best_format, best_count = None, 0
+    for fmt in DATETIME_FORMATS:
+        count = 0
+        for formatted_str in formatted_strs:
+            try:
+                datetime.strptime(formatted_str, fmt)
+                count += 1
+            except ValueError:
+                pass
+        if count > best_count:
+            best_format, best_count = fmt, count
+    return best_format
+
+def make_datetime_parser(datetime_format):
+    fast_pattern = DATETIME_FAST_PATTERNS.get(datetime_format)
+    cache = {}
+
+    def parse(datetime_str):
+        # Timestamps have minute resolution, so busy chats hit the cache for most messages
+        try:
+            return cache[datetime_str]
+        except KeyError:
+            pass
+
+        datetime_obj = None
+        match = fast_pattern.fullmatch(datetime_str.strip()) if fast_pattern else None
+        if match:
+            year = int(match['year'])
+            if len(match['year']) == 2:
+                year += 1900 if year >= 69 else 2000
+            hour = int(match['hour'])
+            if 'ampm' in fast_pattern.groupindex:
+                hour = hour % 12 + (12 if match['ampm'].lower() == 'pm' else 0) if 1 <= hour <= 12 else None
+            if hour is not None:
+                try:
+                    datetime_obj = datetime(year, int(match['month']), int(match['day']), hour, int(match['minute']))
+                except ValueError:
+                    pass
+
+        # Anything the detected layout can't handle goes through the original format loop
+        if datetime_obj is None:
+            datetime_obj = parse_datetime_slow(datetime_str)
+
+        cache[datetime_str] = datetime_obj
+        return datetime_obj
+
+    return parse
+
+@lru_cache(maxsize=None)
+def compile_deleted_message_pattern(warnings):
+    # One case-insensitive search per message instead of lower-casing it once per warning
+    return re.compile("|".join(re.escape(warning) for warning in warnings), re.IGNORECASE)
+
+@lru_cache(maxsize=None)
+def compile_language_markers(language):
+    # Text that only shows up in exports made in this interface language
+    attachment_indicator, deleted_message_warnings = LANGUAGE_SETTINGS[language]
+    markers = ["(" + attachment_indicator + ")", *deleted_message_warnings, ENCRYPTION_NOTICES[language]]
+    return re.compile("|".join(re.escape(marker) for marker in markers), re.IGNORECASE)
+
+LANGUAGE_SAMPLE_LINES = 2000
+
+# Timestamp layouts that point to a language when a sample has no language markers
+# Languages whose exports use each timestamp layout; the layout follows the phone's region, so it is shared
+DATETIME_FORMAT_LANGUAGES = {
+    '%d/%m/%Y %H:%M': ('NL', 'FR', 'PT'),
+    '%d/%m/%y, %H:%M': ('IT', 'ES'),
+    '%m/%d/%y, %I:%M %p': ('EN',),
+}
+
+def detect_language(lines):
+    # Returns the interface language code of the sampled chat lines, or None when it can't be told
+    lines = list(islice(lines, LANGUAGE_SAMPLE_LINES))
+    scores = {language: sum(1 for line in lines if compile_language_markers(language).search(line)) for language in LANGUAGE_SETTINGS}
+    best_score = max(scores.values())
+    candidates = [language for language, score in scores.items() if score == best_score]
+    if best_score and len(candidates) == 1:
+        return candidates[0]
+
+    # No markers, or a tie: the timestamp layout only decides when a single candidate uses it
+    datetime_strs = [match.group(1) for match in map(message_pattern.match, lines) if match]
+    layout_languages = DATETIME_FORMAT_LANGUAGES.get(detect_datetime_format(datetime_strs), ())
+    candidates = [language for language in candidates if language in layout_languages]
+    return candidates[0] if len(candidates) == 1 else None
+
+def detect_zip_language(zip_path):
+    # Reads the first lines of the chat straight from the zip, without extracting anything
+    zip_path = Path(zip_path)
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        txt_name = f"{zip_path.stem}.txt"
+        if txt_name not in zip_ref.NameToInfo:
+            return None
+        with zip_ref.open(txt_name) as member:
+            return detect_language(io.TextIOWrapper(member, encoding='utf-8', errors='replace'))
+
+def slugify_filename(filename):
+    from slugify import slugify
+    return slugify(Path(filename).stem) + Path(filename).suffix
+
+class AttachmentIndex:
+    # The attachments of an export, listed once: original name -> slugified name -> source (a zip member or a file path)
+    __slots__ = ('slugs', 'names_by_slug', 'sources', 'missing')
+
+    def __init__(self, entries):
+        self.slugs = {}
+        self.names_by_slug = {}
+        self.sources = {}  # Sources that haven't been claimed by a message yet
+        self.missing = []  # (message_id, name) of references to files that are not in the export
+        for name, slugified_name, source in entries:
+            # Names that slugify alike share one file; the last one listed wins, as it would on disk
+            self.sources.pop(self.names_by_slug.get(slugified_name), None)
+            self.slugs[name] = slugified_name
+            self.names_by_slug[slugified_name] = name
+            self.sources[name] = source
+
+    def claim(self, name, message_id):
+        # Returns (slugified name, source); the source is None when the file was claimed before or is missing
+        if name not in self.slugs:
+            # The chat may spell the name slightly differently than the file (e.g. invisible direction marks)
+            slugified_name = slugify_filename(name)
+            name = self.names_by_slug.get(slugified_name)
+            if name is None:
+                self.missing.append((message_id, slugified_name))
+                return slugified_name, None
+        return self.slugs[name], self.sources.pop(name, None)
+
+    def remaining(self):
+        # (slugified name, source) of the attachments no message referred to
+        return [(self.slugs[name], source) for name, source in self.sources.items()]
+
 def slugify_filenames_in_folder(folder):
     slugified_filenames = {}
     for file in folder.iterdir():
         if file.is_file():
-            slugified_name = slugify(file.stem) + file.suffix
+            slugified_name = slugify_filename(file.name)
             slugified_path = file.with_name(slugified_name)
             file.rename(slugified_path)
             slugified_filenames[file.name] = slugified_name
     return slugified_filenames
 
-def preprocess_chat_file(txt_file):
+def iter_chat_messages(txt_file, offset=0):
+    # Stream the chat file and yield one match per complete message, joining continuation lines on the fly
     try:
-        with open(txt_file, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+        f = open(txt_file, 'r', encoding='utf-8')
     except FileNotFoundError:
         print("The zip-file appears to have been modified since export. Make sure to use an original zip-file.")
         return
 
-    processed_lines = []
-    current_message = ""
-
-    for line in lines:
-        match = message_pattern.match(line)
-        
-        if match:
-            if current_message:
-                processed_lines.append(current_message.strip())
-            
-            current_message = line.strip()
-        else:
-            current_message += " " + line.strip()
-    
-    if current_message:
-        processed_lines.append(current_message.strip())
-
-    with open(txt_file, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(processed_lines))
-
-def parse_whatsapp_chat(txt_file, attachments_folder, pseudonymize):
-    preprocess_chat_file(txt_file)
-
-    with open(txt_file, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
+    with f:
+        # Resume after the part of the chat that was processed before (a byte offset at a line boundary)
+        if offset:
+            f.seek(offset)
+        yield from join_chat_lines(f)
 
-    messages = []
-    senders = set()
-
-    slugify_filenames_in_folder(attachments_folder)
-
-    message_counts = {}
-
-    if emoji_description:
-        emoji_dict = construct_emoji_dict()
+def join_chat_lines(lines):
+    current_parts = []
 
     for line in lines:
-        match = message_pattern.match(line)
-        if match:
+        if message_pattern.match(line):
+            if current_parts:
+                match = message_pattern.match(" ".join(current_parts).strip())
+                if match:
+                    yield match
 
-            datetime_str, ampm, sender, message = match.groups()
-            senders.add(sender)
+            current_parts = [line.strip()]
+        else:
+            current_parts.append(line.strip())
 
-            # Clean the message text
-            message = clean_message_text(message)
+    if current_parts:
+        match = message_pattern.match(" ".join(current_parts).strip())
+        if match:
+            yield match
+
+class MessageStore:
+    # Column-oriented message table shared by all output writers. Senders are stored as integer IDs, and
+    # datetime strings and parsed timestamps are shared between messages sent in the same minute.
+    __slots__ = ('message_ids', 'datetime_strs', 'timestamps', 'sender_ids', 'messages', 'has_attachments', 'senders', 'sender_ids_by_name', 'interned_datetime_strs')
+
+    def __init__(self):
+        self.message_ids = []
+        self.datetime_strs = []
+        self.timestamps = []
+        self.sender_ids = array('I')
+        self.messages = []
+        self.has_attachments = bytearray()
+        self.senders = []
+        self.sender_ids_by_name = {}
+        self.interned_datetime_strs = {}
+
+    def __len__(self):
+        return len(self.message_ids)
+
+    def intern_sender(self, sender):
+        sender_id = self.sender_ids_by_name.get(sender)
+        if sender_id is None:
+            sender_id = len(self.senders)
+            self.senders.append(sender)
+            self.sender_ids_by_name[sender] = sender_id
+        return sender_id
+
+    def append(self, message_id, datetime_str, timestamp, sender, message, attachment_folder):
+        self.message_ids.append(message_id)
+        self.datetime_strs.append(self.interned_datetime_strs.setdefault(datetime_str, datetime_str))
+        self.timestamps.append(timestamp)
+        self.sender_ids.append(self.intern_sender(sender))
+        self.messages.append(message)
+        # The attachment folder is always named after the message ID
+        self.has_attachments.append(1 if attachment_folder else 0)
+
+    def __iter__(self):
+        # Yields (message_id, datetime_str, timestamp, sender_id, message, attachment_folder)
+        for message_id, datetime_str, timestamp, sender_id, message, has_attachment in zip(self.message_ids, self.datetime_strs, self.timestamps, self.sender_ids, self.messages, self.has_attachments):
+            yield message_id, datetime_str, timestamp, sender_id, message, message_id if has_attachment else ''
+
+class SummaryStatistics:
+    # Running totals for the summary, updated once per message while parsing
+    __slots__ = ('total_messages', 'total_attachments', 'earliest', 'latest', 'participants')
+
+    def __init__(self):
+        self.total_messages = 0
+        self.total_attachments = 0
+        self.earliest = None  # (timestamp, datetime_str)
+        self.latest = None
+        # sender -> [messages, attachments, first (timestamp, datetime_str), last (timestamp, datetime_str)], in order of first message
+        self.participants = {}
+
+    def add(self, sender, timestamp, datetime_str, has_attachment):
+        self.total_messages += 1
+        if has_attachment:
+            self.total_attachments += 1
+
+        # Compare real timestamps; the datetime strings don't sort chronologically
+        if self.earliest is None or timestamp < self.earliest[0]:
+            self.earliest = (timestamp, datetime_str)
+        if self.latest is None or timestamp >= self.latest[0]:
+            self.latest = (timestamp, datetime_str)
+
+        participant = self.participants.get(sender)
+        if participant is None:
+            self.participants[sender] = [1, 1 if has_attachment else 0, (timestamp, datetime_str), (timestamp, datetime_str)]
+            return
+        participant[0] += 1
+        if has_attachment:
+            participant[1] += 1
+        if timestamp < participant[2][0]:
+            participant[2] = (timestamp, datetime_str)
+        if timestamp >= participant[3][0]:
+            participant[3] = (timestamp, datetime_str)
+
+    def summary_rows(self, senders, pseudonym_mapping):
+        rows = [
+            ['EarliestMessageDate', self.earliest[1]],
+            ['LatestMessageDate', self.latest[1]],
+            ['NumberOfParticipants', len(senders)],
+            ['TotalMessages', self.total_messages],
+            ['TotalAttachments', self.total_attachments],
+        ]
+        for sender, (message_count, attachment_count, first_message, last_message) in self.participants.items():
+            sender = pseudonym_mapping.get(sender, sender)
+            rows.append([f'{sender}_Messages', message_count])
+            rows.append([f'{sender}_Attachments', attachment_count])
+            rows.append([f'{sender}_FirstMessage', first_message[1]])
+            rows.append([f'{sender}_LastMessage', last_message[1]])
+        return rows
+
+    def to_dict(self):
+        def moment(value):
+            return [value[0].isoformat(), value[1]] if value else None
+        return {
+            'total_messages': self.total_messages,
+            'total_attachments': self.total_attachments,
+            'earliest': moment(self.earliest),
+            'latest': moment(self.latest),
+            'participants': [[sender, counts[0], counts[1], moment(counts[2]), moment(counts[3])] for sender, counts in self.participants.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        def moment(value):
+            return (datetime.fromisoformat(value[0]), value[1]) if value else None
+        stats = cls()
+        stats.total_messages = data['total_messages']
+        stats.total_attachments = data['total_attachments']
+        stats.earliest = moment(data['earliest'])
+        stats.latest = moment(data['latest'])
+        for sender, message_count, attachment_count, first_message, last_message in data['participants']:
+            stats.participants[sender] = [message_count, attachment_count, moment(first_message), moment(last_message)]
+        return stats
+
+MISSING_ATTACHMENTS_SHOWN = 20
+PARALLEL_PARSE_MIN_BYTES = 4 * 1024 * 1024  # Smaller chats are parsed in the main process; starting workers costs more
+PARSE_CHUNKS_PER_WORKER = 4  # More chunks than workers, so a slow chunk doesn't hold up the others
+
+def prepare_chat_messages(chat_messages, parse_datetime, attachment_indicator, deleted_message_warnings, annotate_emoji=None):
+    # The part of parsing that doesn't depend on earlier messages, so any chunk of the chat can go through it on its own.
+    # Yields (datetime_str, sender, message, timestamp, folder name, attachment names or None, deleted)
+    attachment_marker = "(" + attachment_indicator + ")"
+    attachment_pattern = compile_attachment_pattern(attachment_indicator)
+    deleted_message_pattern = compile_deleted_message_pattern(tuple(deleted_message_warnings))
+    moments = {}  # datetime_str -> (timestamp, folder name yyyymmddhhmm)
+
+    for match in chat_messages:
+        datetime_str, ampm, sender, message = match.groups()
+
+        # Clean the message text
+        message = clean_message_text(message)
+
+        # Add emoji names after emojis
+        if annotate_emoji is not None:
+            message = annotate_emoji(message)
+
+        moment = moments.get(datetime_str)
+        if moment is None:
+            timestamp = parse_datetime(datetime_str)
+            moment = moments[datetime_str] = (timestamp, timestamp.strftime('%Y%m%d%H%M') if timestamp is not None else None)
+
+        if attachment_marker in message:
+            yield datetime_str, sender, message, *moment, attachment_pattern.findall(message), False
+        else:
+            yield datetime_str, sender, message, *moment, None, deleted_message_pattern.search(message) is not None
+
+def plan_parse_chunks(txt_file, offset, workers):
+    # Byte offsets that split the chat (from offset on) into chunks starting at message headers, so no message is cut
+    # in two; the last offset is the end of the file. None when the chat is too small to be worth splitting.
+    import mmap
+
+    size = os.path.getsize(txt_file)
+    if size - offset < PARALLEL_PARSE_MIN_BYTES:
+        return None
+    chunk_count = workers * PARSE_CHUNKS_PER_WORKER
+    boundaries = [offset]
+    with open(txt_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for index in range(1, chunk_count):
+            position = max(offset + (size - offset) * index // chunk_count, boundaries[-1] + 1)
+            # Walk forward from the first line that starts at or after the position until a line starts a new message
+            newline = mm.find(b'\n', position - 1)
+            position = newline + 1 if newline != -1 else size
+            while position < size:
+                line_end = mm.find(b'\n', position)
+                if line_end == -1:
+                    line_end = size
+                # A lone carriage return also ends a line when the file is read as text
+                if message_pattern.match(mm[position:line_end].decode('utf-8', errors='replace').split('\r', 1)[0]):
+                    break
+                position = line_end + 1
+            if position >= size:
+                break
+            boundaries.append(position)
+    boundaries.append(size)
+    return boundaries
+
+def parse_chat_chunk(txt_file, start, end, datetime_format, settings):
+    # Runs in a worker process: prepare the messages between two byte offsets of the chat
+    import mmap
+
+    attachment_indicator, deleted_message_warnings, emoji_description, api_key = settings
+    annotate_emoji = None
+    if emoji_description:
+        with redirect_stdout(io.StringIO()):
+            annotate_emoji = load_emoji_annotator(api_key)
+
+    with open(txt_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        lines = io.TextIOWrapper(io.BytesIO(mm[start:end]), encoding='utf-8')
+    return list(prepare_chat_messages(join_chat_lines(lines), make_datetime_parser(datetime_format), attachment_indicator, deleted_message_warnings, annotate_emoji))
+
+def parse_whatsapp_chat(txt_file, attachments_folder, pseudonymize, attachment_index, zip_ref=None, state=None, deduplicator=None):
+    # state (optional) carries the parse position between runs: 'offset', 'message_counts', 'datetime_format',
+    # 'stats' and 'placed_attachments' are read when present and updated in place
+    state = {} if state is None else state
+    place_attachment = deduplicator.place if deduplicator is not None else extract_zip_member
+    messages = MessageStore()
+    stats = state.setdefault('stats', SummaryStatistics())
+    placed_attachments = state.setdefault('placed_attachments', {})
+
+    message_counts = state.setdefault('message_counts', {})
+
+    annotate_emoji = load_emoji_annotator(api_key) if emoji_description else None
+
+    # Detect the timestamp layout once from a sample of messages
+    chat_messages = iter_chat_messages(txt_file, state.get('offset', 0))
+    sample = list(islice(chat_messages, DATETIME_SAMPLE_SIZE))
+    if state.get('datetime_format') is None:
+        state['datetime_format'] = detect_datetime_format(match.group(1) for match in sample)
+
+    # Large chats are prepared in chunks by worker processes; everything that depends on earlier messages
+    # (message IDs, attachments, statistics) is done below, in chat order
+    chunks = plan_parse_chunks(txt_file, state.get('offset', 0), parse_workers) if parse_workers > 1 and Path(txt_file).exists() else None
+    executor = None
+    if chunks:
+        from concurrent.futures import ProcessPoolExecutor
+        chat_messages.close()
+        executor = ProcessPoolExecutor(max_workers=parse_workers)
+        settings = (attachment_indicator, tuple(deleted_message_warnings), emoji_description, api_key)
+        count = len(chunks) - 1
+        prepared_messages = chain.from_iterable(executor.map(parse_chat_chunk, [str(txt_file)] * count, chunks[:-1], chunks[1:], [state['datetime_format']] * count, [settings] * count))
+    else:
+        prepared_messages = prepare_chat_messages(chain(sample, chat_messages), make_datetime_parser(state['datetime_format']), attachment_indicator, deleted_message_warnings, annotate_emoji)
 
-            # Add emoji names after emojis
-            if emoji_description:
-                message = add_emoji_names(emoji_dict, message)
-            
-            # Convert the datetime string to the desired folder name format: yyyymmddhhmm
-            datetime_obj = None
+    # The file system work for attachments runs on a thread pool so parsing doesn't wait for it;
+    # each placement thread streams members through its own handle on the zip (see ZipHandles)
+    zip_handles = ZipHandles(zip_ref.filename) if zip_ref is not None else None
 
-            formatted_str = preprocess_datetime(datetime_str.strip())
+    def place_message_attachments(attachment_folder, placements):
+        attachment_folder.mkdir(parents=True, exist_ok=True)
+        for source, destination_path in placements:
+            if zip_handles is not None:
+                place_attachment(zip_handles.get(), source, destination_path)
+            else:
+                shutil.move(source, destination_path)
 
-            formats = [
-                '%d/%m/%Y %H:%M',      # Day/Month/Year Hour:Minute = NL pattern
-                '%d/%m/%y, %H:%M',      # Day/Month/Year Hour:Minute = IT pattern
-                '%m/%d/%y, %I:%M %p',  # Month/Day/Year, Hour:Minute AM/PM = EN pattern
-            ]
+    placer = AttachmentPlacer(attachment_workers)
 
-            for fmt in formats:
-                try:
-                    datetime_obj = datetime.strptime(formatted_str, fmt)
-                    break
-                except ValueError:
-                    continue
+    try:
+        for datetime_str, sender, message, datetime_obj, folder_name, attachment_names_unslugified, deleted in prepared_messages:
+            messages.intern_sender(sender)
 
             if datetime_obj is None:
                 continue
 
-            # Create a standardized folder name
-            folder_name = datetime_obj.strftime('%Y%m%d%H%M')
-
             # Generate a unique ID based on datetime and message count
             message_count = message_counts.get(datetime_str, 0) + 1
             message_counts[datetime_str] = message_count
             message_id = f"{folder_name}_{message_count:02d}"
-                      
+
             # Check if the message references attachments
-            if "(" + attachment_indicator + ")" in message:
+            if attachment_names_unslugified is not None:
 
                 # Create a folder named after the message_id
                 attachment_folder = attachments_folder / message_id
-                if not attachment_folder.exists():
-                    attachment_folder.mkdir(parents=True, exist_ok=True)
+                placements = []
 
-                # Find all attachment names in the message
-                attachment_names_unslugified = re.findall(r"([\S ]+)\s\(" + attachment_indicator + r"\)", message)
                 for attachment_name_unslugified in attachment_names_unslugified:
 
-                    # Create slugified name
-                    slugified_name = slugify(Path(attachment_name_unslugified).stem) + Path(attachment_name_unslugified).suffix
-                    
-                    # Define the source and destination paths
-                    source_path = attachments_folder / slugified_name
-                    destination_path = attachment_folder / slugified_name
-                    
-                    if source_path.exists() and source_path.is_file():
-                        shutil.move(source_path, destination_path)
-                    
+                    # Look up the slugified name and source; a file goes to the first message that refers to it
+                    slugified_name, source = attachment_index.claim(attachment_name_unslugified, message_id)
+                    if source is not None:
+                        placements.append((source, attachment_folder / slugified_name))
+                        if zip_ref is not None:
+                            placed_attachments[slugified_name] = (f"{message_id}/{slugified_name}", source)
+
                     # Replace references in the message with the slugified filename
                     message = message.replace(f"{attachment_name_unslugified} ({attachment_indicator})", f"[{slugified_name}]")
-            
+
+                placer.submit(message_id, place_message_attachments, attachment_folder, placements)
                 attachment_folder = message_id
             else:
                 attachment_folder = ""
-                for warning in deleted_message_warnings:
-                    if warning.lower() in message.lower():
-                        message = "***Deleted message***"
-                        break
+                if deleted:
+                    message = "***Deleted message***"
 
             # Append the message and attachment folder (if any) to the messages list
-            messages.append((message_id, datetime_str, sender, message, attachment_folder))
+            messages.append(message_id, datetime_str, datetime_obj, sender, message, attachment_folder)
+            stats.add(sender, datetime_obj, datetime_str, bool(attachment_folder))
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    # Every folder exists before the output files link to it
+    try:
+        placer.finish()
+    finally:
+        if zip_handles is not None:
+            zip_handles.close()
+
+    if attachment_index.missing:
+        print(f"\u26a0 {len(attachment_index.missing)} referenced attachment(s) are not in the export:")
+        for message_id, slugified_name in attachment_index.missing[:MISSING_ATTACHMENTS_SHOWN]:
+            print(f"    {message_id}: {slugified_name}")
+        if len(attachment_index.missing) > MISSING_ATTACHMENTS_SHOWN:
+            print(f"    ... and {len(attachment_index.missing) - MISSING_ATTACHMENTS_SHOWN} more")
     
     # Create pseudonym mapping (if applicable)
-    pseudonym_mapping = create_pseudonym_mapping(senders)
+    pseudonym_mapping = create_pseudonym_mapping(messages.senders)
     
-    return messages, sorted(senders), pseudonym_mapping
+    return messages, sorted(messages.senders), pseudonym_mapping, stats
 
-def create_csv(conversation_name, messages, senders, output_csv, attachments_folder, pseudonym_mapping):
+def wide_header(senders, pseudonym_mapping):
+    # Add pseudonymized sender names to header
+    return ['ConversationName', 'MessageID', 'DateTime', 'AttachmentFolder'] + [pseudonym_mapping.get(sender, sender) for sender in senders]
+
+def iter_wide_rows(conversation_name, messages, senders, attachments_folder, pseudonym_mapping):
+    # Yields (row, message column, timestamp) with one column per participant, as in the csv and Excel files
     if pseudonymize:
-        # Replace real names with pseudonyms in sender names
-        senders = [replace_names_by_pseudonymes(sender, pseudonym_mapping) for sender in senders]
+        replace_names = build_pseudonym_replacer(pseudonym_mapping)
 
-    with open(output_csv, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        
-        # Add pseudonymized sender names to header
-        header = ['ConversationName', 'MessageID', 'DateTime', 'AttachmentFolder'] + senders
-        writer.writerow(header)
-        
-        for msg in messages:
-            message_id, datetime_str, sender, message, attachment_folder = msg
-            
-            if pseudonymize:
-                # Replace real names with pseudonyms in the message
-                message = replace_names_by_pseudonymes(message, pseudonym_mapping)
-                # Replace real sender names with pseudonyms
-                sender = replace_names_by_pseudonymes(sender, pseudonym_mapping)
+    # Map each sender ID to its column once instead of searching the sender list per row
+    sender_columns = [4 + senders.index(sender) for sender in messages.senders]
+    empty_columns = [''] * len(senders)
 
-            row = [conversation_name, message_id, datetime_str, f'=HYPERLINK("{attachments_folder}\\{attachment_folder}")' if attachment_folder else ''] + ['' for _ in senders]
+    for message_id, datetime_str, timestamp, sender_id, message, attachment_folder in messages:
+        if pseudonymize:
+            # Replace real names with pseudonyms in the message
+            message = replace_names(message)
 
-            # Place the message in the correct sender column
-            row[4 + senders.index(sender)] = message
+        row = [conversation_name, message_id, datetime_str, f'=HYPERLINK("{attachments_folder}\\{attachment_folder}")' if attachment_folder else ''] + empty_columns
 
+        # Place the message in the correct sender column
+        column = sender_columns[sender_id]
+        row[column] = message
+
+        yield row, column, timestamp
+
+def create_csv(conversation_name, messages, senders, output_csv, attachments_folder, pseudonym_mapping):
+    with open(output_csv, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(wide_header(senders, pseudonym_mapping))
+        
+        for row, _, _ in iter_wide_rows(conversation_name, messages, senders, attachments_folder, pseudonym_mapping):
             writer.writerow(row)
 
         if "csv" in file_types:
@@ -249,46 +989,129 @@ def create_csv(conversation_name, messages, senders, output_csv, attachments_fol
             else:
                 print(f"\u2713 Csv file created: '{output_csv}'")
 
-def create_summary_csv(conversation_name, messages, senders, summary_csv, pseudonym_mapping):
-    if not messages:
-        return
-    
-    summary_data = {
-        'EarliestMessageDate': [min(msg[1] for msg in messages)],
-        'LatestMessageDate': [max(msg[1] for msg in messages)],
-        'NumberOfParticipants': [len(senders)],
-        'TotalMessages': [len(messages)],
-        'TotalAttachments': [sum(1 for msg in messages if msg[4])]
-    }
+def append_csv(conversation_name, messages, senders, output_csv, attachments_folder, pseudonym_mapping):
+    # The header is already there; the participants (and so the columns) are the same as in the previous run
+    with open(output_csv, 'a', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        for row, _, _ in iter_wide_rows(conversation_name, messages, senders, attachments_folder, pseudonym_mapping):
+            writer.writerow(row)
 
-    participant_stats = defaultdict(lambda: {
-        'messages': 0,
-        'attachments': 0,
-        'first_message': None,
-        'last_message': None
-    })
-    for message_id, datetime_str, sender, _, attachment_folder in messages:
-        participant_stats[sender]['messages'] += 1
-        if attachment_folder:
-            participant_stats[sender]['attachments'] += 1
-        if participant_stats[sender]['first_message'] is None:
-            participant_stats[sender]['first_message'] = datetime_str
-        participant_stats[sender]['last_message'] = datetime_str
-
-    for sender, stats in participant_stats.items():
-        sender = pseudonym_mapping.get(sender, sender)
-        summary_data[f'{sender}_Messages'] = [stats['messages']]
-        summary_data[f'{sender}_Attachments'] = [stats['attachments']]
-        summary_data[f'{sender}_FirstMessage'] = [stats['first_message']]
-        summary_data[f'{sender}_LastMessage'] = [stats['last_message']]
+    print(f"\u2713 Csv file updated: '{output_csv}'")
+
+def create_summary_csv(summary_rows, summary_csv):
+    if not summary_rows:
+        return
     
     with open(summary_csv, 'w', newline='', encoding='utf-8') as csvfile:
         writer = csv.writer(csvfile)
-        for key, value in summary_data.items():
-            if pseudonymize:
-                writer.writerow([replace_names_by_pseudonymes(key, pseudonym_mapping), replace_names_by_pseudonymes(value[0],pseudonym_mapping)])
-            else:
-                writer.writerow([key, value[0]])
+        writer.writerows(summary_rows)
+
+ACTIVITY_TABLES = ['daily', 'weekly', 'monthly', 'hourly', 'participants_monthly', 'response_gaps']
+ACTIVITY_DERIVED_COLUMNS = ['attachment_rate', 'mean_gap_minutes']  # Recomputed from the counts, never added up
+
+# Upper bounds (in minutes, exclusive) of the response gap buckets; the last bucket is open
+RESPONSE_GAP_BUCKETS = [(1, 'under_1_min'), (5, '1_to_5_min'), (15, '5_to_15_min'), (60, '15_to_60_min'), (360, '1_to_6_hours'), (1440, '6_to_24_hours'), (None, 'over_24_hours')]
+
+def wants_activity_tables():
+    # Computing them loads pandas, which is only worth it when they are written
+    return activity_tables or "xlsx" in file_types
+
+def activity_csv(output_folder, stem, table, suffix):
+    return output_folder / f"{stem}_activity_{table}{suffix}.csv"
+
+def compute_activity_tables(messages, senders, pseudonym_mapping, previous_message=None):
+    # Activity over time, per participant and between participants, computed with column operations over the whole chat.
+    # Every stored column is a count or a sum, so the tables of an update can be added to the earlier ones.
+    # previous_message: (timestamp, sender) of the message before the first one, for the first response gap
+    import numpy as np
+    import pandas as pd
+
+    names = [pseudonym_mapping.get(sender, sender) for sender in messages.senders]
+    participants = [pseudonym_mapping.get(sender, sender) for sender in senders]
+    # pandas converts datetime objects in C; NumPy would do it one object at a time
+    moments = pd.DatetimeIndex(messages.timestamps).values.astype('datetime64[m]')
+    timestamps = pd.DatetimeIndex(moments)
+    sender_codes = np.frombuffer(messages.sender_ids, dtype=f'u{messages.sender_ids.itemsize}').astype(np.int64)
+    attachments = np.frombuffer(messages.has_attachments, dtype=np.uint8).astype(np.int64)
+    frame = pd.DataFrame({'messages': 1, 'attachments': attachments}, index=timestamps)
+    months = timestamps.to_period('M')
+
+    daily = frame.groupby(timestamps.normalize()).sum()
+    daily.index = daily.index.strftime('%Y-%m-%d')
+    # Weeks start on Monday
+    weekly = frame.groupby((timestamps - pd.to_timedelta(timestamps.dayofweek, unit='D')).normalize()).sum()
+    weekly.index = weekly.index.strftime('%Y-%m-%d')
+    monthly = frame.groupby(months).sum()
+    monthly.index = monthly.index.strftime('%Y-%m')
+    hourly = frame[['messages']].groupby(timestamps.hour).sum().reindex(range(24), fill_value=0)
+
+    participants_monthly = pd.DataFrame({'month': months, 'sender': sender_codes}).groupby(['month', 'sender']).size().unstack(fill_value=0)
+    participants_monthly.index = participants_monthly.index.strftime('%Y-%m')
+    participants_monthly.columns = [names[code] for code in participants_monthly.columns]
+    participants_monthly = participants_monthly.reindex(columns=participants, fill_value=0)
+
+    # A response is a message that follows a message from someone else; its gap is counted for the one responding
+    minutes = moments.astype(np.int64)
+    if previous_message is not None:
+        minutes = np.concatenate(([np.datetime64(previous_message[0], 'm').astype(np.int64)], minutes))
+        sender_codes = np.concatenate(([messages.sender_ids_by_name.get(previous_message[1], -1)], sender_codes))
+    responses = sender_codes[1:] != sender_codes[:-1]
+    gaps = np.maximum(np.diff(minutes), 0)[responses]
+    buckets = np.searchsorted([bound for bound, _ in RESPONSE_GAP_BUCKETS[:-1]], gaps, side='right')
+    gap_frame = pd.DataFrame({'sender': sender_codes[1:][responses], 'bucket': buckets, 'gap': gaps})
+    grouped = gap_frame.groupby('sender')
+    response_gaps = pd.concat([
+        grouped.size().rename('responses'),
+        grouped['gap'].sum().rename('total_gap_minutes'),
+        gap_frame.groupby(['sender', 'bucket']).size().unstack(fill_value=0).reindex(columns=range(len(RESPONSE_GAP_BUCKETS)), fill_value=0).set_axis([label for _, label in RESPONSE_GAP_BUCKETS], axis=1),
+    ], axis=1)
+    response_gaps.index = [names[code] for code in response_gaps.index]
+    response_gaps = response_gaps.reindex(participants, fill_value=0).fillna(0).astype(np.int64)
+
+    tables = {'daily': daily, 'weekly': weekly, 'monthly': monthly, 'hourly': hourly, 'participants_monthly': participants_monthly, 'response_gaps': response_gaps}
+    for name, index_name in (('daily', 'date'), ('weekly', 'week'), ('monthly', 'month'), ('hourly', 'hour'), ('participants_monthly', 'month'), ('response_gaps', 'participant')):
+        tables[name].index.name = index_name
+    return tables
+
+def finish_activity_tables(tables):
+    # Adds the columns derived from the counts
+    tables['monthly']['attachment_rate'] = (tables['monthly']['attachments'] / tables['monthly']['messages']).round(4)
+    responses = tables['response_gaps']['responses']
+    tables['response_gaps']['mean_gap_minutes'] = (tables['response_gaps']['total_gap_minutes'] / responses.where(responses > 0)).round(1)
+    return tables
+
+def read_activity_tables(output_folder, stem, suffix):
+    # The tables written by the previous run, without their derived columns; None when one of them is missing
+    import pandas as pd
+
+    tables = {}
+    for table in ACTIVITY_TABLES:
+        path = activity_csv(output_folder, stem, table, suffix)
+        if not path.exists():
+            return None
+        # The first column is the index; participant names and dates stay text
+        previous = pd.read_csv(path, index_col=0, dtype={0: str}, keep_default_na=False)
+        previous.index = previous.index.astype('int64' if table == 'hourly' else str)
+        tables[table] = previous.drop(columns=[column for column in ACTIVITY_DERIVED_COLUMNS if column in previous.columns])
+    return tables
+
+def add_activity_tables(previous_tables, tables):
+    # Adds the counts of new messages to those of the previous run
+    merged = {}
+    for name, table in tables.items():
+        previous = previous_tables[name]
+        columns = list(previous.columns) + [column for column in table.columns if column not in previous.columns]
+        index_order = list(previous.index) + [index for index in table.index if index not in previous.index]
+        combined = previous.reindex(index=index_order, columns=columns, fill_value=0).add(table.reindex(index=index_order, columns=columns, fill_value=0))
+        if name != 'response_gaps':
+            combined = combined.sort_index()
+        combined.index.name = table.index.name
+        merged[name] = combined.astype('int64')
+    return merged
+
+def write_activity_csvs(tables, output_folder, stem, suffix):
+    for table, frame in tables.items():
+        frame.to_csv(activity_csv(output_folder, stem, table, suffix), encoding='utf-8')
 
 def create_pseudonym_csv(pseudonym_mapping, output_folder):
     pseudonym_csv = output_folder / "pseudonym_mapping.csv"
@@ -300,130 +1123,387 @@ def create_pseudonym_csv(pseudonym_mapping, output_folder):
     print(f"\u2713 Pseudonym mapping csv created: '{pseudonym_csv}'")
 
 def create_pseudonymized_txt(txt_file, pseudonym_mapping, output_folder):
-    with open(txt_file, 'r', encoding='utf-8') as file:
-        content = file.read()
     pseudonym_txt_file = output_folder / f"{txt_file.stem}_pseudonymized.txt"
+    replace_names = build_pseudonym_replacer(pseudonym_mapping)
 
-    # Replace the names in the entire content using the existing function
-    pseudonymized_content = replace_names_by_pseudonymes(content, pseudonym_mapping)
-
-    # Write the pseudonymized content to the output file
-    with open(pseudonym_txt_file, 'w', encoding='utf-8') as file:
-        file.write(pseudonymized_content)
+    # Stream the original text line by line; names never span a line break
+    with open(txt_file, 'r', encoding='utf-8', newline='') as source, open(pseudonym_txt_file, 'w', encoding='utf-8', newline='') as destination:
+        for line in source:
+            destination.write(replace_names(line))
     
     print(f"\u2713 Pseudonymized text file created: '{pseudonym_txt_file}'")
 
-def create_json_from_csv(csv_file, json_file, pseudonymize=False):
-    data = []
-
-    with open(csv_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            conversation_name = row.get("ConversationName")
-            message_id = row.get("MessageID")
-            date_time = row.get("DateTime")
-            attachment_folder = row.get("AttachmentFolder")
-
-            # Iterate over each participant's message field
-            for participant, message in row.items():
-                if participant not in ["ConversationName", "MessageID", "DateTime", "AttachmentFolder"] and message.strip():
-                    data.append({
-                        "ConversationName": conversation_name,
-                        "MessageID": message_id,
-                        "DateTime": date_time,
-                        "Name": participant,
-                        "Message": message
-                    })
-
+def iter_json_records(conversation_name, messages, pseudonym_mapping):
+    if pseudonymize:
+        replace_names = build_pseudonym_replacer(pseudonym_mapping)
+    names = [pseudonym_mapping.get(sender, sender) for sender in messages.senders]
+
+    for message_id, datetime_str, _, sender_id, message, _ in messages:
+        if not message.strip():
+            continue
+        if pseudonymize:
+            message = replace_names(message)
+        yield {
+            "ConversationName": conversation_name,
+            "MessageID": message_id,
+            "DateTime": datetime_str,
+            "Name": names[sender_id],
+            "Message": message
+        }
+
+def create_json(conversation_name, messages, json_file, pseudonym_mapping, ndjson=False):
+    # Records are written one at a time, so memory use does not grow with the size of the chat
     with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+        if ndjson:
+            for record in iter_json_records(conversation_name, messages, pseudonym_mapping):
+                f.write(json.dumps(record, ensure_ascii=False))
+                f.write('\n')
+        else:
+            # Same layout as json.dump(records, indent=4)
+            written = write_json_array_items(f, iter_json_records(conversation_name, messages, pseudonym_mapping), '[\n    ')
+            f.write('\n]' if written else '[]')
+
+    file_type = "Ndjson" if ndjson else "Json"
+    if pseudonymize:
+        print(f"\u2713 Pseudonymized {file_type.lower()} file created: '{json_file}'")
+    else:
+        print(f"\u2713 {file_type} file created: '{json_file}'")
+
+def write_json_array_items(f, records, separator):
+    # Writes the records as indented array items; returns whether anything was written
+    written = False
+    for record in records:
+        f.write(separator)
+        f.write(json.dumps(record, ensure_ascii=False, indent=4).replace('\n', '\n    '))
+        separator = ',\n    '
+        written = True
+    return written
+
+def append_json(conversation_name, messages, json_file, pseudonym_mapping, ndjson=False):
+    records = iter_json_records(conversation_name, messages, pseudonym_mapping)
+    if ndjson:
+        with open(json_file, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False))
+                f.write('\n')
+    else:
+        # Reopen the array written by create_json: drop its closing bracket and continue after the last item
+        with open(json_file, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(size - 2, 0))
+            end = f.read()
+            if end == b'\n]':
+                start, separator = size - 2, ',\n    '
+            elif end == b'[]' and size == 2:
+                start, separator = 0, '[\n    '
+            else:
+                raise ValueError(f"'{json_file}' does not end like a file written by this script")
+            f.seek(start)
+            f.truncate()
+            text = io.TextIOWrapper(f, encoding='utf-8', newline='')
+            written = write_json_array_items(text, records, separator)
+            text.write('\n]' if written or start else '[]')
+            text.flush()
+            text.detach()
+
+    print(f"\u2713 {'Ndjson' if ndjson else 'Json'} file updated: '{json_file}'")
+
+SQLITE_BATCH_SIZE = 10000  # Rows per executemany call
+SQLITE_LOCK_TIMEOUT = 6 * 3600  # Seconds a job waits while another one is loading into the same database
+
+# A conversation is identified by the folder its output was written to, as different exports can have the same name
+SQLITE_CONVERSATIONS_COLUMNS = """(
+    conversation_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    source TEXT NOT NULL UNIQUE,
+    pseudonymized INTEGER NOT NULL
+)"""
+
+SQLITE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS conversations {SQLITE_CONVERSATIONS_COLUMNS};
+CREATE TABLE IF NOT EXISTS participants (
+    participant_id INTEGER PRIMARY KEY,
+    conversation_id INTEGER NOT NULL REFERENCES conversations (conversation_id),
+    name TEXT NOT NULL,
+    UNIQUE (conversation_id, name)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation_id INTEGER NOT NULL REFERENCES conversations (conversation_id),
+    message_id TEXT NOT NULL,
+    datetime TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    participant_id INTEGER NOT NULL REFERENCES participants (participant_id),
+    message TEXT NOT NULL,
+    attachment_folder TEXT,
+    UNIQUE (conversation_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS messages_timestamp ON messages (conversation_id, timestamp);
+CREATE INDEX IF NOT EXISTS messages_participant ON messages (participant_id);
+CREATE TABLE IF NOT EXISTS attachments (
+    attachment_id INTEGER PRIMARY KEY,
+    conversation_id INTEGER NOT NULL REFERENCES conversations (conversation_id),
+    message_id TEXT,
+    file_name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS attachments_message ON attachments (conversation_id, message_id);
+"""
+
+# Full-text index over the message text, kept in sync with the messages table by triggers
+SQLITE_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(message, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2');
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, message) VALUES (new.id, new.message);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, message) VALUES ('delete', old.id, old.message);
+END;
+"""
+
+def list_attachment_files(attachments_folder):
+    # (path relative to the attachments folder, size) of every attachment, in message folders or loose
+    attachment_files = []
+    for entry in os.scandir(attachments_folder):
+        if entry.is_dir():
+            attachment_files.extend((f"{entry.name}/{file.name}", file.stat().st_size) for file in os.scandir(entry.path) if file.is_file())
+        elif entry.is_file():
+            attachment_files.append((entry.name, entry.stat().st_size))
+    return attachment_files
+
+def create_sqlite(conversation_name, messages, sqlite_file, pseudonym_mapping, attachment_files, source, replace=True):
+    # Loads the conversation into a SQLite database (created when needed) in a single transaction.
+    # source: the output folder, which identifies the conversation in a database shared by many exports.
+    # replace: remove an earlier copy of the conversation first; otherwise the messages are added to it.
+    import sqlite3
+
+    connection = sqlite3.connect(sqlite_file, timeout=SQLITE_LOCK_TIMEOUT)
+    try:
+        connection.executescript(SQLITE_SCHEMA)
+        try:
+            connection.executescript(SQLITE_FTS_SCHEMA)
+        except sqlite3.OperationalError as e:
+            print(f"Warning: no full-text index in '{sqlite_file}' ({e}).")
+
+        with connection:
+            # Take the write lock up front, so jobs loading into the same archive wait for each other instead of failing
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT conversation_id FROM conversations WHERE source = ?", (str(source),)).fetchone()
+            if row is not None and replace:
+                for table in ('messages', 'attachments', 'participants', 'conversations'):
+                    connection.execute(f"DELETE FROM {table} WHERE conversation_id = ?", (row[0],))
+                row = None
+            if row is None:
+                conversation_id = connection.execute("INSERT INTO conversations (name, source, pseudonymized) VALUES (?, ?, ?)", (conversation_name, str(source), int(bool(pseudonymize)))).lastrowid
+            else:
+                conversation_id = row[0]
+
+            names = [pseudonym_mapping.get(sender, sender) for sender in messages.senders]
+            connection.executemany("INSERT OR IGNORE INTO participants (conversation_id, name) VALUES (?, ?)", [(conversation_id, name) for name in names])
+            participant_ids_by_name = dict(connection.execute("SELECT name, participant_id FROM participants WHERE conversation_id = ?", (conversation_id,)))
+            participant_ids = [participant_ids_by_name[name] for name in names]
+
+            if pseudonymize:
+                replace_names = build_pseudonym_replacer(pseudonym_mapping)
+            rows = (
+                (conversation_id, message_id, datetime_str.strip(), timestamp.isoformat(sep=' ', timespec='minutes'), participant_ids[sender_id], replace_names(message) if pseudonymize else message, attachment_folder or None)
+                for message_id, datetime_str, timestamp, sender_id, message, attachment_folder in messages
+            )
+            insert_message = "INSERT INTO messages (conversation_id, message_id, datetime, timestamp, participant_id, message, attachment_folder) VALUES (?, ?, ?, ?, ?, ?, ?)"
+            batch = list(islice(rows, SQLITE_BATCH_SIZE))
+            while batch:
+                connection.executemany(insert_message, batch)
+                batch = list(islice(rows, SQLITE_BATCH_SIZE))
+
+            connection.executemany(
+                "INSERT INTO attachments (conversation_id, message_id, file_name, path, size) VALUES (?, ?, ?, ?, ?)",
+                ((conversation_id, path.split('/')[0] if '/' in path else None, path.rsplit('/', 1)[-1], f"attachments/{path}", size) for path, size in attachment_files)
+            )
+        connection.execute("PRAGMA optimize")
+    finally:
+        connection.close()
 
     if pseudonymize:
-        print(f"\u2713 Pseudonymised json file created: '{json_file}'")
+        print(f"\u2713 Pseudonymized SQLite database {'created' if replace else 'updated'}: '{sqlite_file}'")
     else:
-        print(f"\u2713 Json file created: '{json_file}'")
+        print(f"\u2713 SQLite database {'created' if replace else 'updated'}: '{sqlite_file}'")
+
+PARQUET_ROW_GROUP_SIZE = 100000  # Messages per row group
+PARQUET_COMPRESSION = 'zstd'
+
+def parquet_schema(pa):
+    # Repeated strings (conversation, language, sender) are dictionary-encoded
+    return pa.schema([
+        ('conversation_name', pa.dictionary(pa.int32(), pa.string())),
+        ('language', pa.dictionary(pa.int32(), pa.string())),
+        ('message_id', pa.string()),
+        ('timestamp', pa.timestamp('ms')),
+        ('datetime', pa.string()),
+        ('sender', pa.dictionary(pa.int32(), pa.string())),
+        ('message', pa.string()),
+        ('attachment_folder', pa.string()),
+    ])
+
+def iter_parquet_batches(pa, schema, conversation_name, messages, pseudonym_mapping):
+    # One record batch per row group, built straight from the columns of the message store
+    names = pa.array([pseudonym_mapping.get(sender, sender) for sender in messages.senders], pa.string())
+    conversation_names = pa.array([conversation_name], pa.string())
+    languages = pa.array([language.lower()], pa.string())
+    if pseudonymize:
+        replace_names = build_pseudonym_replacer(pseudonym_mapping)
+
+    for start in range(0, len(messages), PARQUET_ROW_GROUP_SIZE):
+        end = min(start + PARQUET_ROW_GROUP_SIZE, len(messages))
+        constant = pa.array([0] * (end - start), pa.int32())
+        message_ids = messages.message_ids[start:end]
+        texts = messages.messages[start:end]
+        yield pa.RecordBatch.from_arrays([
+            pa.DictionaryArray.from_arrays(constant, conversation_names),
+            pa.DictionaryArray.from_arrays(constant, languages),
+            pa.array(message_ids, pa.string()),
+            pa.array(messages.timestamps[start:end], pa.timestamp('ms')),
+            pa.array([datetime_str.strip() for datetime_str in messages.datetime_strs[start:end]], pa.string()),
+            pa.DictionaryArray.from_arrays(pa.array(messages.sender_ids[start:end], pa.int32()), names),
+            pa.array([replace_names(text) for text in texts] if pseudonymize else texts, pa.string()),
+            pa.array([message_id if has_attachment else None for message_id, has_attachment in zip(message_ids, messages.has_attachments[start:end])], pa.string()),
+        ], schema=schema)
+
+def create_parquet(conversation_name, messages, parquet_file, pseudonym_mapping, append=False):
+    # Long-format message table, written one row group at a time.
+    # append: keep the rows of an existing file; Parquet files can't be extended, so it is rewritten next to the original.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema(pa)
+    target = parquet_file.with_name(parquet_file.name + '.tmp') if append else parquet_file
+    with pq.ParquetWriter(target, schema, compression=PARQUET_COMPRESSION) as writer:
+        if append:
+            for batch in pq.ParquetFile(parquet_file).iter_batches(batch_size=PARQUET_ROW_GROUP_SIZE):
+                writer.write_batch(batch)
+        for batch in iter_parquet_batches(pa, schema, conversation_name, messages, pseudonym_mapping):
+            writer.write_batch(batch)
+    if append:
+        os.replace(target, parquet_file)
 
-def create_excel_from_csv(csv_file, excel_file, summary_csv):
-    
-    # Load CSV file
-    with open(csv_file, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        rows = list(reader)
-
-    # Extract the headers and sender names
-    headers = rows[0]
-    senders = headers[4:]
-    sender_colors = assign_colors_to_senders(senders)
-    
-    # Create a new Excel workbook and sheet
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "WhatsApp Chat"
-
-    # Write headers to the Excel file
-    for col_num, header in enumerate(headers, 1):
-        ws.cell(row=1, column=col_num, value=header)
-
-    # Define font style for deleted messages
-    deleted_message_font = Font(color="808080", italic=True)
-
-    # Write rows to the Excel file
-    for row_num, row in enumerate(rows[1:], 2):  # Skip the header
-        for col_num, cell_value in enumerate(row, 1):
-            cell = ws.cell(row=row_num, column=col_num, value=cell_value)
-            
-            # Apply color formatting based on sender
-            if col_num > 4:  # Message columns start from the 5th column
-                sender = headers[col_num-1]
-                if cell_value:
-
-                    # Apply color fill for messages
-                    cell.fill = sender_colors.get(sender, PatternFill())
-
-                    # Special formatting for deleted messages
-                    if "***Deleted message***" in cell_value:
-                        cell.font = deleted_message_font
-                        cell.fill = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
-            
-            # Apply color to the attachment folder cell if it exists
-            if col_num == 4 and cell_value:
-                sender_index = next((i for i, value in enumerate(row[4:], 4) if value), None)
-                if sender_index is not None:
-                    attachment_color = sender_colors.get(headers[sender_index])
-                    cell.fill = attachment_color
+    if pseudonymize:
+        print(f"\u2713 Pseudonymized parquet file {'updated' if append else 'created'}: '{parquet_file}'")
+    else:
+        print(f"\u2713 Parquet file {'updated' if append else 'created'}: '{parquet_file}'")
+
+EXCEL_MAX_ROWS = 1048576  # Rows per worksheet, including the header row
+
+def create_excel(conversation_name, messages, senders, excel_file, attachments_folder, pseudonym_mapping, summary_rows, activity=None):
+    import openpyxl
+
+    # Write-only workbook: rows are streamed to disk and every cell shares one of a few named styles
+    wb = openpyxl.Workbook(write_only=True)
+
+    # Chats that don't fit on one sheet are split by year, and further when a single year is still too long
+    split_by_year = len(messages) > EXCEL_MAX_ROWS - 1
+    wide_rows = iter_wide_rows(conversation_name, messages, senders, attachments_folder, pseudonym_mapping)
+    write_excel_chat_rows(wb, wide_rows, wide_header(senders, pseudonym_mapping), split_by_year)
+    write_excel_summary(wb, summary_rows, activity)
+
+    # Save the Excel file
+    wb.save(excel_file)
+    if pseudonymize:
+        print(f"\u2713 Pseudonymized Excel file created: '{excel_file}'")
+    else:
+        print(f"\u2713 Excel file created: '{excel_file}'")
+
+def append_excel(conversation_name, messages, senders, excel_file, attachments_folder, pseudonym_mapping, summary_rows, activity=None):
+    # Add new messages to an existing workbook; needs a regular (not write-only) workbook, so the file is loaded once
+    import openpyxl
+
+    wb = openpyxl.load_workbook(excel_file)
+    if "Summary" in wb.sheetnames:
+        del wb["Summary"]
+
+    # Continue on the last chat sheet, keeping its year when the workbook is split by year
+    ws = wb.worksheets[-1] if wb.worksheets else None
+    year_match = re.fullmatch(r"WhatsApp Chat (\d{4})(?: \(\d+\))?", ws.title) if ws is not None else None
+    wide_rows = iter_wide_rows(conversation_name, messages, senders, attachments_folder, pseudonym_mapping)
+    write_excel_chat_rows(wb, wide_rows, wide_header(senders, pseudonym_mapping), year_match is not None, ws, int(year_match.group(1)) if year_match else None)
+    write_excel_summary(wb, summary_rows, activity)
+
+    wb.save(excel_file)
+    print(f"\u2713 Excel file updated: '{excel_file}'")
+
+def write_excel_chat_rows(wb, wide_rows, headers, split_by_year, ws=None, ws_year=None):
+    # Appends the rows to ws (a new sheet when None), rolling over to new sheets at the row limit
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import NamedStyle, PatternFill, Font
+
+    sender_styles = register_sender_styles(wb, headers[4:])
+    deleted_message_style = "Deleted message"
+    if deleted_message_style not in wb.named_styles:
+        wb.add_named_style(NamedStyle(name=deleted_message_style, font=Font(color="808080", italic=True), fill=PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")))
+
+    sheet_names = set(wb.sheetnames)
+
+    def new_chat_sheet(year):
+        title = f"WhatsApp Chat {year}" if split_by_year else "WhatsApp Chat"
+        number = 1
+        while title in sheet_names:
+            number += 1
+            title = f"WhatsApp Chat {year} ({number})" if split_by_year else f"WhatsApp Chat ({number})"
+        sheet_names.add(title)
+        ws = wb.create_sheet(title=title)
+        ws.append(headers)
+        return ws
+
+    ws_rows = ws.max_row - 1 if ws is not None else 0
+    for row, column, timestamp in wide_rows:
+        if ws is None or ws_rows >= EXCEL_MAX_ROWS - 1 or (split_by_year and timestamp.year != ws_year):
+            ws = new_chat_sheet(timestamp.year)
+            ws_year = timestamp.year
+            ws_rows = 0
+
+        cells = [cell_value if cell_value else None for cell_value in row]
+        message = row[column]
+        sender_style = sender_styles[headers[column]]
+
+        # Apply color formatting based on sender, with special formatting for deleted messages
+        if message:
+            message_cell = WriteOnlyCell(ws, value=message)
+            message_cell.style = deleted_message_style if "***Deleted message***" in message else sender_style
+            cells[column] = message_cell
+
+        # Apply color to the attachment folder cell if it exists
+        if row[3]:
+            attachment_cell = WriteOnlyCell(ws, value=row[3])
+            attachment_cell.style = sender_style
+            cells[3] = attachment_cell
+
+        ws.append(cells)
+        ws_rows += 1
+
+    if ws is None:
+        new_chat_sheet(None)
+
+def write_excel_summary(wb, summary_rows, activity=None):
+    from openpyxl.chart import PieChart, Reference
 
     # Add a new worksheet for summary statistics
     ws_summary = wb.create_sheet(title="Summary")
-    df_summary = pd.read_csv(summary_csv)
-    for r in dataframe_to_rows(df_summary, index=False, header=True):
-        ws_summary.append(r)
-
-    # Identify rows in column A that contain "_Messages"
-    message_rows = []
-    for row in ws_summary.iter_rows(min_col=1, max_col=1):
-        cell = row[0]
-        if '_Messages' in cell.value:
-            message_rows.append(cell.row)
-
-    # Convert the message count cells to integers (if they are formatted as text)
-    for row in message_rows:
-        message_count_cell = ws_summary.cell(row=row, column=2)
-        try:
-            message_count_cell.value = int(message_count_cell.value)
-        except ValueError:
-            pass  # In case the value isn't a valid integer, do nothing
+    message_rows = [row for row in summary_rows if '_Messages' in row[0]]
 
-    # Create a helper table for pie chart data
+    # Create a helper table for pie chart data next to the statistics
     temp_table_start_row = 18
     temp_table_start_col = 6
-    ws_summary.cell(row=temp_table_start_row - 1, column=temp_table_start_col, value="Participant")
-    ws_summary.cell(row=temp_table_start_row - 1, column=temp_table_start_col + 1, value="Number of Messages")
-    
+    helper_rows = {temp_table_start_row - 1: ["Participant", "Number of Messages"]}
     for index, row in enumerate(message_rows):
-        participant_name = ws_summary.cell(row=row, column=1).value
-        message_count = ws_summary.cell(row=row, column=2).value
-        ws_summary.cell(row=temp_table_start_row + index, column=temp_table_start_col, value=participant_name)
-        ws_summary.cell(row=temp_table_start_row + index, column=temp_table_start_col + 1, value=message_count)
+        helper_rows[temp_table_start_row + index] = [row[0], row[1]]
+
+    # Write-only sheets are filled row by row, so both tables are merged per row
+    rows_written = max([len(summary_rows)] + list(helper_rows))
+    for row_num in range(1, rows_written + 1):
+        cells = list(summary_rows[row_num - 1]) if row_num <= len(summary_rows) else []
+        if row_num in helper_rows:
+            cells += [None] * (temp_table_start_col - 1 - len(cells)) + helper_rows[row_num]
+        ws_summary.append(cells)
 
     # Create a pie chart for message distribution by participant
     pie_chart = PieChart()
@@ -439,34 +1519,493 @@ def create_excel_from_csv(csv_file, excel_file, summary_csv):
     # Add the pie chart to the "Summary" worksheet
     ws_summary.add_chart(pie_chart, "E2")
 
-    # Save the Excel file
-    wb.save(excel_file)
-    if pseudonymize:
-        print(f"\u2713 Pseudonymized Excel file created: '{excel_file}'")
-    else:
-        print(f"\u2713 Excel file created: '{excel_file}'")
-
-def assign_colors_to_senders(senders):
-    color_palette = [
-        "FFCCCC", "CCFFCC", "CCCCFF", "FFFFCC", "FFCCFF", "CCFFFF", "FFD700", 
-        "FF69B4", "87CEFA", "98FB98", "FFDAB9", "FFA07A", "D3D3D3"
-    ]
-    sender_colors = {}
+    if activity is not None:
+        write_excel_activity(ws_summary, activity, rows_written)
+
+EXCEL_ACTIVITY_BLOCK_ROWS = 20  # Rows reserved per activity table, so its chart doesn't cover the next one
+
+# (table, title, chart type, charted columns or None for all, stacked)
+EXCEL_ACTIVITY_BLOCKS = [
+    ('hourly', "Messages by Hour of Day", 'bar', ['messages'], False),
+    ('monthly', "Messages and Attachments by Month", 'line', ['messages', 'attachments'], False),
+    ('participants_monthly', "Messages per Participant per Month", 'bar', None, True),
+    ('response_gaps', "Response Gaps per Participant", 'bar', [label for _, label in RESPONSE_GAP_BUCKETS], True),
+    ('weekly', "Messages by Week", 'line', ['messages'], False),
+    ('daily', "Messages by Day", 'line', ['messages'], False),
+]
+
+def write_excel_activity(ws, activity, rows_written):
+    # Appends the activity tables below the summary, each with a chart next to it
+    from openpyxl.chart import BarChart, LineChart, Reference
+    from openpyxl.utils import get_column_letter
+
+    row_num = rows_written
+    for table_name, title, chart_type, charted_columns, stacked in EXCEL_ACTIVITY_BLOCKS:
+        table = activity[table_name]
+        ws.append([])
+        ws.append([title])
+        header_row = row_num + 3
+        ws.append([table.index.name] + list(table.columns))
+        # Plain Python values, with empty cells for missing means
+        for values in table.astype(object).where(table.notna(), None).itertuples():
+            ws.append(list(values))
+        row_num = header_row + len(table)
+
+        if len(table):
+            chart = BarChart() if chart_type == 'bar' else LineChart()
+            chart.title = title
+            if stacked:
+                chart.grouping = 'stacked'
+                chart.overlap = 100
+            for column in charted_columns or list(table.columns):
+                column_num = 2 + list(table.columns).index(column)
+                chart.add_data(Reference(ws, min_col=column_num, min_row=header_row, max_row=row_num), titles_from_data=True)
+            chart.set_categories(Reference(ws, min_col=1, min_row=header_row + 1, max_row=row_num))
+            chart.width = 24
+            ws.add_chart(chart, f"{get_column_letter(len(table.columns) + 3)}{header_row}")
+
+        while row_num < header_row + EXCEL_ACTIVITY_BLOCK_ROWS:
+            ws.append([])
+            row_num += 1
+
+SENDER_COLOR_PALETTE = [
+    "FFCCCC", "CCFFCC", "CCCCFF", "FFFFCC", "FFCCFF", "CCFFFF", "FFD700", 
+    "FF69B4", "87CEFA", "98FB98", "FFDAB9", "FFA07A", "D3D3D3"
+]
+
+def register_sender_styles(wb, senders):
+    from openpyxl.styles import NamedStyle, PatternFill
+
+    # One named style per palette color, shared by every cell of the senders using it
+    sender_styles = {}
     for i, sender in enumerate(senders):
-        color = color_palette[i % len(color_palette)]
-        sender_colors[sender] = PatternFill(start_color=color, end_color=color, fill_type="solid")
-    return sender_colors
+        color = SENDER_COLOR_PALETTE[i % len(SENDER_COLOR_PALETTE)]
+        style_name = f"Sender {color}"
+        if style_name not in wb.named_styles:
+            wb.add_named_style(NamedStyle(name=style_name, fill=PatternFill(start_color=color, end_color=color, fill_type="solid")))
+        sender_styles[sender] = style_name
+    return sender_styles
+
+PROFILE_REPORT_VERSION = 2
+
+def peak_rss_mb(children=False):
+    # High-water mark of resident memory since the process started (it never goes down), of this process or of the
+    # largest child process that has finished and been waited for (parse and output workers); not available on Windows
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)  # bytes on macOS, kilobytes elsewhere
+
+class StageProfiler:
+    # Records wall time, CPU time (all threads), memory and item counts for each stage of a run. The memory figures are
+    # high-water marks: the process peak so far, how much the stage raised it (0 when it stayed below an earlier
+    # stage's peak) and the largest finished child process so far. Stages named in cprofile_stages are also run under cProfile.
+    def __init__(self, cprofile_stages=()):
+        self.cprofile_stages = set(cprofile_stages)
+        self.stages = []
+        self.profiles = {}
+        self.started = (time.perf_counter(), time.process_time())
+
+    @contextmanager
+    def stage(self, name):
+        # Yields a dict for the stage's item counts, e.g. messages, attachments and bytes
+        counts = {}
+        profile = None
+        if name in self.cprofile_stages:
+            import cProfile
+            profile = cProfile.Profile()
+            profile.enable()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        peak_start = peak_rss_mb()
+        try:
+            yield counts
+        finally:
+            wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            if profile is not None:
+                profile.disable()
+                self.profiles[name] = profile
+            peak = peak_rss_mb()
+            self.stages.append({
+                'stage': name, 'wall_s': round(wall, 4), 'cpu_s': round(cpu, 4),
+                'process_peak_rss_mb': peak, 'process_peak_growth_mb': round(peak - peak_start, 1) if peak is not None else None,
+                'children_peak_rss_mb': peak_rss_mb(children=True), **counts,
+            })
+
+    def add(self, stage):
+        # A stage timed elsewhere, e.g. in a writer process
+        self.stages.append(stage)
+
+    def write(self, report_file, zip_path, **details):
+        report = {
+            'version': PROFILE_REPORT_VERSION,
+            'zip': str(zip_path),
+            'zip_bytes': Path(zip_path).stat().st_size,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': sys.platform,
+            **details,
+            'wall_s': round(time.perf_counter() - self.started[0], 4),
+            'cpu_s': round(time.process_time() - self.started[1], 4),
+            'process_peak_rss_mb': peak_rss_mb(),
+            'children_peak_rss_mb': peak_rss_mb(children=True),
+            'stages': self.stages,
+            'cprofile': {},
+        }
+        for name, profile in self.profiles.items():
+            profile_file = report_file.with_name(f"{report_file.stem}_{name}.prof")
+            profile.dump_stats(profile_file)
+            report['cprofile'][name] = profile_file.name
+
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+        print(f"\u2713 Profile report created: '{report_file}'")
+
+# Writers of the fan-out in progress; forked writer processes inherit them, so the parsed messages are never pickled
+_output_writers = []
+
+def memory_headroom():
+    # (resident memory of this process, memory available to new processes) in bytes, from /proc; None elsewhere
+    try:
+        with open('/proc/self/statm') as f:
+            resident = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return resident, int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+def output_writer_processes(workers):
+    # A forked writer starts out sharing the parent's memory, but CPython's reference counting writes to every object
+    # it reads, so each writer soon holds its own copy of most of the message store. Only start as many as there are
+    # copies of this process that fit in the available memory; 0 or 1 means threads, which share the messages.
+    headroom = memory_headroom()
+    if headroom is None:
+        return workers
+    resident, available = headroom
+    return min(workers, available // max(resident, 1))
+
+def run_output_writer(profiler, writer):
+    # writer: (stage name, output file or None, item counts, function writing the file)
+    name, output_file, counts, write = writer
+    with profiler.stage(name) as stage_counts:
+        write()
+        stage_counts.update(counts)
+        if output_file is not None:
+            stage_counts['bytes'] = Path(output_file).stat().st_size
+
+def run_forked_output_writer(index):
+    # Runs in a forked process: its messages are passed back and printed by the parent, in order
+    profiler = StageProfiler()
+    with redirect_stdout(io.StringIO()) as log:
+        run_output_writer(profiler, _output_writers[index])
+    return log.getvalue(), profiler.stages[0]
+
+def write_outputs(writers, profiler):
+    # Every writer reads the parsed messages on its own, so they run side by side and the whole takes about as
+    # long as the slowest one. They run in forked processes when those fit in memory (see output_writer_processes);
+    # otherwise, and where fork isn't safe or available (Windows, macOS), on threads, which still overlap the
+    # compression and file I/O.
+    global _output_writers
+    workers = min(output_workers, len(writers))
+    if workers <= 1:
+        for writer in writers:
+            run_output_writer(profiler, writer)
+        return
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    errors = []
+    with profiler.stage('write_outputs') as counts:
+        processes = output_writer_processes(workers) if sys.platform != 'darwin' and 'fork' in multiprocessing.get_all_start_methods() else 0
+        counts.update(writers=len(writers), workers=processes if processes > 1 else workers, processes=processes > 1)
+        if processes > 1:
+            _output_writers = writers
+            try:
+                with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('fork')) as executor:
+                    futures = [executor.submit(run_forked_output_writer, index) for index in range(len(writers))]
+                    for writer, future in zip(writers, futures):
+                        try:
+                            log, stage = future.result()
+                        except Exception as e:
+                            errors.append((writer[0], e))
+                            continue
+                        print(log, end='')
+                        profiler.add(stage)
+            finally:
+                _output_writers = []
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(run_output_writer, profiler, writer) for writer in writers]
+                for writer, future in zip(writers, futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        errors.append((writer[0], e))
+
+    for name, e in errors:
+        print(f"\u2717 Writing the {name} output failed: {e}")
+    if errors:
+        raise errors[0][1]
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+MANIFEST_MESSAGE_COUNTS_KEPT = 1440  # Latest datetime strings whose message counts are kept to continue the message IDs
+
+def output_settings(pseudonymize):
+    # Settings that change the content of the output files; an update is only possible when they are the same
+    return {
+        'file_types': sorted(file_types),
+        'pseudonymize': bool(pseudonymize),
+        'emoji_description': bool(emoji_description),
+        'attachment_indicator': attachment_indicator,
+        'deduplicate_attachments': bool(deduplicate_attachments),
+        # An archive given for the first time needs the whole conversation, not just the new messages
+        'sqlite_archive': str(Path(sqlite_archive).resolve()) if sqlite_archive else None,
+        'activity_tables': wants_activity_tables(),
+    }
+
+def hash_txt_file(txt_file, prefix_size=0):
+    # One pass over the file: returns (sha256 of the first prefix_size bytes, sha256 of the whole file, size)
+    digest = hashlib.sha256()
+    prefix_digest = digest.hexdigest() if prefix_size == 0 else None
+    size = 0
+    with open(txt_file, 'rb') as f:
+        while True:
+            chunk = f.read(min(ZIP_COPY_BUFFER_SIZE, prefix_size - size) if size < prefix_size else ZIP_COPY_BUFFER_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+            if size == prefix_size:
+                prefix_digest = digest.hexdigest()
+    return prefix_digest, digest.hexdigest(), size
+
+def read_manifest(output_folder):
+    try:
+        with open(output_folder / MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+def write_manifest(output_folder, conversation_name, pseudonymize, txt_file, state, senders, messages_added, incremental, previous=None):
+    # Records what has been processed, so a later export of the same conversation only needs to handle what is new
+    _, txt_digest, txt_size = hash_txt_file(txt_file)
+    attachments = dict(previous['attachments']) if previous else {}
+    for slugified_name, (path, member) in state['placed_attachments'].items():
+        attachments[slugified_name] = {'path': path, 'crc32': member.CRC, 'size': member.file_size}
+    runs = list(previous['runs']) if previous else []
+    runs.append({'processed': datetime.now().isoformat(timespec='seconds'), 'messages_added': messages_added, 'incremental': incremental})
+    stats = state['stats']
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'conversation_name': conversation_name,
+        'settings': output_settings(pseudonymize),
+        'txt': {'name': txt_file.name, 'size': txt_size, 'sha256': txt_digest},
+        'datetime_format': state['datetime_format'],
+        'message_count': stats.total_messages,
+        'last_message_id': state.get('last_message_id') or (previous['last_message_id'] if previous else None),
+        'last_message': state.get('last_message') or (previous.get('last_message') if previous else None),  # [timestamp, sender], for the next response gap
+        'message_counts': list(state['message_counts'].items())[-MANIFEST_MESSAGE_COUNTS_KEPT:],
+        'senders': senders,
+        'statistics': stats.to_dict(),
+        'attachments': attachments,
+        'deduplication': state.get('deduplication'),
+        'runs': runs,
+    }
+    manifest_file = output_folder / MANIFEST_NAME
+    temporary_file = manifest_file.with_suffix('.tmp')
+    with open(temporary_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=4)
+    os.replace(temporary_file, manifest_file)
+
+def read_pseudonym_csv(output_folder):
+    with open(output_folder / "pseudonym_mapping.csv", 'r', newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader, None)
+        return {real_name: pseudonym for real_name, pseudonym in reader}
+
+def update_whatsapp_output(zip_path, output_folder, manifest, pseudonymize, profiler=None):
+    # Adds the messages and attachments that are new since the run recorded in the manifest.
+    # Returns False (leaving the outputs as they were) when that's not possible and everything has to be processed again.
+    conversation_name = zip_path.stem
+    txt_name = f"{zip_path.stem}.txt"
+    txt_file = output_folder / txt_name
+    attachments_folder = output_folder / 'attachments'
+    profiler = profiler or StageProfiler()
+
+    if manifest['settings'] != output_settings(pseudonymize):
+        print("\u2022 The settings differ from the previous run.")
+        return False
+
+    # The activity tables of the new messages are added to those of the previous run
+    suffix = "_pseudonymized" if pseudonymize else ""
+    if wants_activity_tables() and manifest['message_count'] and not all(activity_csv(output_folder, zip_path.stem, table, suffix).exists() for table in ACTIVITY_TABLES):
+        print("\u2022 The previous run has no activity tables.")
+        return False
+
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        if txt_name not in zip_ref.NameToInfo:
+            print(f"\u2022 '{txt_name}' was not found in the zip file.")
+            return False
+
+        # A new export repeats the complete history: the part processed before must be unchanged
+        new_txt_file = output_folder / f"{txt_name}.new"
+        previous_size = manifest['txt']['size']
+        with profiler.stage('extract') as counts:
+            extract_zip_member(zip_ref, zip_ref.getinfo(txt_name), new_txt_file)
+            prefix_digest, _, size = hash_txt_file(new_txt_file, previous_size)
+            counts.update(bytes=size)
+        if size < previous_size or prefix_digest != manifest['txt']['sha256']:
+            os.remove(new_txt_file)
+            print("\u2022 The earlier part of the conversation differs from the previous run.")
+            return False
+
+        # Attachments that were placed before are skipped
+        attachment_index = index_zip_attachments(zip_ref, txt_name)
+        for name, member in list(attachment_index.sources.items()):
+            known = manifest['attachments'].get(attachment_index.slugs[name])
+            if known and known['crc32'] == member.CRC and known['size'] == member.file_size:
+                del attachment_index.sources[name]
+
+        # New attachments are only deduplicated among themselves; the counts continue from the previous run
+        deduplicator = None
+        if deduplicate_attachments:
+            deduplicator = AttachmentDeduplicator.for_zip(zip_path, attachment_index.sources.values())
+            deduplicator.add_counts(manifest['deduplication'])
+
+        # Continue parsing where the previous run stopped
+        state = {
+            'offset': previous_size,
+            'datetime_format': manifest['datetime_format'],
+            'message_counts': dict(manifest['message_counts']),
+            'stats': SummaryStatistics.from_dict(manifest['statistics']),
+        }
+        with profiler.stage('parse') as counts:
+            messages, _, _, stats = parse_whatsapp_chat(new_txt_file, attachments_folder, pseudonymize, attachment_index, zip_ref, state, deduplicator)
+            counts.update(messages=len(messages), attachments=len(state['placed_attachments']), bytes=size - previous_size)
+
+        # New participants would add columns to every output file
+        new_senders = [sender for sender in messages.senders if sender not in manifest['senders']]
+        if new_senders:
+            os.remove(new_txt_file)
+            print(f"\u2022 New participants since the previous run: {', '.join(new_senders)}.")
+            return False
+
+        place_attachment = deduplicator.place if deduplicator is not None else extract_zip_member
+        for slugified_name, member in attachment_index.remaining():
+            place_attachment(zip_ref, member, attachments_folder / slugified_name)
+            state['placed_attachments'][slugified_name] = (slugified_name, member)
+        state['deduplication'] = deduplicator.to_dict() if deduplicator is not None else None
+
+    senders = manifest['senders']
+    pseudonym_mapping = read_pseudonym_csv(output_folder) if pseudonymize else {}
+
+    # Without a manifest, an update that fails halfway can't be mistaken for a finished one next time
+    os.remove(output_folder / MANIFEST_NAME)
+
+    summary_rows = stats.summary_rows(senders, pseudonym_mapping) if stats.total_messages else []
+    if summary_rows and deduplicator is not None:
+        summary_rows += deduplicator.summary_rows()
+    create_summary_csv(summary_rows, output_folder / f"{zip_path.stem}_summary{suffix}.csv")
+
+    activity = None
+    if len(messages) and wants_activity_tables():
+        with profiler.stage('activity') as counts:
+            previous_message = manifest.get('last_message')
+            activity = compute_activity_tables(messages, senders, pseudonym_mapping, (datetime.fromisoformat(previous_message[0]), previous_message[1]) if previous_message else None)
+            previous_activity = read_activity_tables(output_folder, zip_path.stem, suffix) if manifest['message_count'] else None
+            activity = finish_activity_tables(add_activity_tables(previous_activity, activity) if previous_activity else activity)
+            write_activity_csvs(activity, output_folder, zip_path.stem, suffix)
+            counts.update(messages=len(messages))
+
+    # The files are brought up to date at the same time, as in a full run
+    item_counts = {'messages': len(messages)}
+    writers = []
+    if "csv" in file_types:
+        output_csv = output_folder / f"{zip_path.stem}{suffix}.csv"
+        writers.append(('csv', None, item_counts, lambda: append_csv(conversation_name, messages, senders, output_csv, attachments_folder, pseudonym_mapping)))
+
+    if "json" in file_types:
+        output_json = output_folder / f"{zip_path.stem}{suffix}.json"
+        writers.append(('json', None, item_counts, lambda: append_json(conversation_name, messages, output_json, pseudonym_mapping)))
+
+    if "ndjson" in file_types:
+        output_ndjson = output_folder / f"{zip_path.stem}{suffix}.ndjson"
+        writers.append(('ndjson', None, item_counts, lambda: append_json(conversation_name, messages, output_ndjson, pseudonym_mapping, ndjson=True)))
 
-def process_whatsapp_zip(zip_path, pseudonymize):
+    if "sqlite" in file_types or sqlite_archive:
+        attachment_files = [(path, member.file_size) for path, member in state['placed_attachments'].values()]
+        sqlite_files = ([output_folder / f"{zip_path.stem}{suffix}.sqlite"] if "sqlite" in file_types else []) + ([Path(sqlite_archive)] if sqlite_archive else [])
+        for sqlite_file in sqlite_files:
+            writers.append(('sqlite', None, {**item_counts, 'attachments': len(attachment_files)}, lambda sqlite_file=sqlite_file: create_sqlite(conversation_name, messages, sqlite_file, pseudonym_mapping, attachment_files, output_folder.resolve(), replace=False)))
+
+    if "parquet" in file_types and len(messages):
+        output_parquet = output_folder / f"{zip_path.stem}{suffix}.parquet"
+        writers.append(('parquet', None, item_counts, lambda: create_parquet(conversation_name, messages, output_parquet, pseudonym_mapping, append=True)))
+
+    # Loading the workbook is the expensive part, so leave it alone when nothing was added
+    if "xlsx" in file_types and len(messages):
+        excel_file = output_folder / f"{zip_path.stem}{suffix}.xlsx"
+        writers.append(('xlsx', None, item_counts, lambda: append_excel(conversation_name, messages, senders, excel_file, attachments_folder, pseudonym_mapping, summary_rows, activity)))
+
+    write_outputs(writers, profiler)
+
+    if pseudonymize:
+        # Only the new part of the text needs pseudonymizing
+        replace_names = build_pseudonym_replacer(pseudonym_mapping)
+        with open(new_txt_file, 'r', encoding='utf-8', newline='') as source, open(output_folder / f"{txt_file.stem}_pseudonymized.txt", 'a', encoding='utf-8', newline='') as destination:
+            source.seek(previous_size)
+            for line in source:
+                destination.write(replace_names(line))
+
+    os.replace(new_txt_file, txt_file)
+    state['last_message_id'] = messages.message_ids[-1] if len(messages) else None
+    state['last_message'] = [messages.timestamps[-1].isoformat(), messages.senders[messages.sender_ids[-1]]] if len(messages) else None
+    write_manifest(output_folder, conversation_name, pseudonymize, txt_file, state, senders, len(messages), True, manifest)
+    print(f"\u2713 Added {len(messages)} new messages to '{output_folder}'")
+    return True
+
+def process_whatsapp_zip(zip_path, pseudonymize, stream_from_zip=True, overwrite=None, open_when_finished=None, incremental=None, profile=False, profile_parse=False, output_folder=None):
+    # overwrite / open_when_finished / incremental: True or False to decide without asking, None to prompt (or use OPEN_WHEN_FINISHED)
+    # profile: write a per-stage timing report next to the results; profile_parse: also dump a cProfile of the parse stage
+    # output_folder: where to write the results (default: next to the zip, named after it)
     zip_path = Path(zip_path)
-    output_folder = zip_path.parent / zip_path.stem
+    output_folder = Path(output_folder) if output_folder else zip_path.parent / zip_path.stem
+    profiler = StageProfiler(['parse'] if profile_parse else [])
+
+    # An output folder with a manifest can be brought up to date with only the new messages and attachments
+    manifest = read_manifest(output_folder) if stream_from_zip and output_folder.exists() else None
+    if manifest is not None and incremental is None and overwrite is None:
+        incremental = input("\u2022 This conversation was processed before. Do you want to add only the new messages and attachments? (yes/no): ").strip().lower() == 'yes'
+    if manifest is not None and incremental:
+        if update_whatsapp_output(zip_path, output_folder, manifest, pseudonymize, profiler):
+            if profile or profile_parse:
+                profiler.write(output_folder / f"{zip_path.stem}_profile.json", zip_path, incremental=True)
+            return finish_processing(output_folder, pseudonymize, open_when_finished)
+        # Rebuilding means deleting the earlier output, which may hold history the new export no longer has
+        # (a truncated re-export, or another chat with the same name), so it needs the same consent as any overwrite
+        print("\u2022 The output can't be brought up to date; the whole conversation has to be processed again.")
+        profiler = StageProfiler(['parse'] if profile_parse else [])
     
     # Check if the output folder already exists
     if output_folder.exists():
-        user_choice = input(f"\u2022 The output folder already exists. Do you want to delete '{output_folder}' and continue? (yes/no): ").strip().lower()
+        if overwrite is None:
+            user_choice = input(f"\u2022 The output folder already exists. Do you want to delete '{output_folder}' and continue? (yes/no): ").strip().lower()
+        else:
+            user_choice = 'yes' if overwrite else 'no'
         if user_choice == 'yes':
             shutil.rmtree(output_folder)
             print(f"\u2713 Deleted folder '{output_folder}'")
+        elif overwrite is False:
+            raise FileExistsError(f"The output folder '{output_folder}' already exists{' and could not be updated' if manifest is not None and incremental else ''}.")
         else:
             print("Operation canceled by the user.")
             return
@@ -478,63 +2017,158 @@ def process_whatsapp_zip(zip_path, pseudonymize):
     output_folder.mkdir(exist_ok=True)
     print(f"\u2713 Created folder '{output_folder}'")
     
-    # Extract the ZIP file
-    extract_zip(zip_path, output_folder)
-    
     # Find the txt file and attachments
-    txt_file = output_folder / f"{zip_path.stem}.txt"
+    txt_name = f"{zip_path.stem}.txt"
+    txt_file = output_folder / txt_name
     attachments_folder = output_folder / 'attachments'
     attachments_folder.mkdir(exist_ok=True)
 
-    # Move all files except the txt file to the attachments folder
-    folder = output_folder.resolve()
-    for item in folder.iterdir():
-        if item.name != f"{zip_path.stem}.txt" and item.is_file():
-            item.rename(attachments_folder / item.name)
-    print(f"\u2713 Attachments moved to dedicated folder: '{output_folder}'")
+    if stream_from_zip:
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            # Decide every attachment's slugified name up front, then extract only the txt file (and anything outside the attachment layout)
+            with profiler.stage('extract') as counts:
+                attachment_index = index_zip_attachments(zip_ref, txt_name)
+                for member in zip_ref.infolist():
+                    if member.is_dir() or '/' in member.filename or member.filename == txt_name:
+                        zip_ref.extract(member, output_folder)
+                counts.update(attachments=len(attachment_index.sources), bytes=txt_file.stat().st_size if txt_file.exists() else 0)
+
+            deduplicator = None
+            if deduplicate_attachments:
+                with profiler.stage('hash_attachments') as counts:
+                    candidates = find_duplicate_candidates(attachment_index.sources.values())
+                    deduplicator = AttachmentDeduplicator(hash_zip_members(zip_path, candidates))
+                    counts.update(attachments=len(candidates), bytes=sum(member.file_size for member in candidates))
 
-    # Slugify all filenames in the attachments folder and create a map for reference
-    slugify_filenames_in_folder(attachments_folder)
+            if emoji_description:
+                with profiler.stage('emoji_table'):
+                    load_emoji_annotator(api_key)
+
+            # Parse the WhatsApp chat, streaming each attachment into its message folder exactly once
+            state = {}
+            with profiler.stage('parse') as counts:
+                messages, senders, pseudonym_mapping, stats = parse_whatsapp_chat(txt_file, attachments_folder, pseudonymize, attachment_index, zip_ref, state, deduplicator)
+                counts.update(messages=len(messages), attachments=len(state['placed_attachments']), bytes=txt_file.stat().st_size if txt_file.exists() else 0)
+
+            # Attachments that no message refers to are kept in the attachments folder
+            with profiler.stage('unreferenced_attachments') as counts:
+                place_attachment = deduplicator.place if deduplicator is not None else extract_zip_member
+                remaining = attachment_index.remaining()
+                for slugified_name, member in remaining:
+                    place_attachment(zip_ref, member, attachments_folder / slugified_name)
+                    state['placed_attachments'][slugified_name] = (slugified_name, member)
+                counts.update(attachments=len(remaining), bytes=sum(member.file_size for _, member in remaining))
+        print(f"\u2713 Attachments placed in dedicated folder: '{attachments_folder}'")
+    else:
+        # Extract the ZIP file
+        with profiler.stage('extract'):
+            extract_zip(zip_path, output_folder)
+
+            # Move all files except the txt file to the attachments folder
+            folder = output_folder.resolve()
+            for item in folder.iterdir():
+                if item.name != txt_name and item.is_file():
+                    item.rename(attachments_folder / item.name)
+        print(f"\u2713 Attachments moved to dedicated folder: '{output_folder}'")
+
+        # Slugify all filenames in the attachments folder and index them for the parser
+        with profiler.stage('slugify') as counts:
+            slugified_filenames = slugify_filenames_in_folder(attachments_folder)
+            attachment_index = AttachmentIndex((name, slugified_name, attachments_folder / slugified_name) for name, slugified_name in slugified_filenames.items())
+            counts.update(attachments=len(slugified_filenames))
 
-    # Parse the WhatsApp chat
-    messages, senders, pseudonym_mapping = parse_whatsapp_chat(txt_file, attachments_folder, pseudonymize)
+        if emoji_description:
+            with profiler.stage('emoji_table'):
+                load_emoji_annotator(api_key)
+
+        # Parse the WhatsApp chat
+        with profiler.stage('parse') as counts:
+            messages, senders, pseudonym_mapping, stats = parse_whatsapp_chat(txt_file, attachments_folder, pseudonymize, attachment_index)
+            counts.update(messages=len(messages), bytes=txt_file.stat().st_size if txt_file.exists() else 0)
+        deduplicator = None
 
     suffix = "_pseudonymized" if pseudonymize else ""
 
-    # Create the CSV file
-    output_csv = output_folder / f"{zip_path.stem}{suffix}.csv"
-    create_csv(conversation_name, messages, senders, output_csv, attachments_folder, pseudonym_mapping)
-    
     # Create the summary CSV file
     output_summary_csv = output_folder / f"{zip_path.stem}_summary{suffix}.csv"
-    create_summary_csv(conversation_name, messages, senders, output_summary_csv, pseudonym_mapping)
-    
-    # Create the JSON file
+    summary_rows = stats.summary_rows(senders, pseudonym_mapping) if stats.total_messages else []
+    if summary_rows and deduplicator is not None:
+        summary_rows += deduplicator.summary_rows()
+    create_summary_csv(summary_rows, output_summary_csv)
+
+    # Activity by day, week, month and hour of day, per participant per month, and response gaps
+    activity = None
+    if len(messages) and wants_activity_tables():
+        with profiler.stage('activity') as counts:
+            activity = finish_activity_tables(compute_activity_tables(messages, senders, pseudonym_mapping))
+            write_activity_csvs(activity, output_folder, zip_path.stem, suffix)
+            counts.update(messages=len(messages))
+
+    # Only the requested files are written, all at the same time from the parsed messages
+    item_counts = {'messages': len(messages)}
+    writers = []
+    if "csv" in file_types:
+        output_csv = output_folder / f"{zip_path.stem}{suffix}.csv"
+        writers.append(('csv', output_csv, item_counts, lambda: create_csv(conversation_name, messages, senders, output_csv, attachments_folder, pseudonym_mapping)))
+
     if "json" in file_types:
         output_json = output_folder / f"{zip_path.stem}{suffix}.json"
-        create_json_from_csv(output_csv, output_json)
+        writers.append(('json', output_json, item_counts, lambda: create_json(conversation_name, messages, output_json, pseudonym_mapping)))
+
+    # One message per line
+    if "ndjson" in file_types:
+        output_ndjson = output_folder / f"{zip_path.stem}{suffix}.ndjson"
+        writers.append(('ndjson', output_ndjson, item_counts, lambda: create_json(conversation_name, messages, output_ndjson, pseudonym_mapping, ndjson=True)))
 
-    # Create the Excel file with pie chart
+    # Excel file with pie chart
     if "xlsx" in file_types:
         excel_file = output_folder / f"{zip_path.stem}{suffix}.xlsx"
-        create_excel_from_csv(output_csv, excel_file, output_summary_csv)
+        writers.append(('xlsx', excel_file, item_counts, lambda: create_excel(conversation_name, messages, senders, excel_file, attachments_folder, pseudonym_mapping, summary_rows, activity)))
 
-    if not "csv" in file_types:
-        os.remove(output_csv)
+    # Typed, columnar message table
+    if "parquet" in file_types:
+        output_parquet = output_folder / f"{zip_path.stem}{suffix}.parquet"
+        writers.append(('parquet', output_parquet, item_counts, lambda: create_parquet(conversation_name, messages, output_parquet, pseudonym_mapping)))
+
+    # A SQLite database with a full-text index, and the shared archive (if any)
+    if "sqlite" in file_types or sqlite_archive:
+        attachment_files = [(path, member.file_size) for path, member in state['placed_attachments'].values()] if stream_from_zip else list_attachment_files(attachments_folder)
+        sqlite_files = ([output_folder / f"{zip_path.stem}{suffix}.sqlite"] if "sqlite" in file_types else []) + ([Path(sqlite_archive)] if sqlite_archive else [])
+        for sqlite_file in sqlite_files:
+            writers.append(('sqlite', sqlite_file, {**item_counts, 'attachments': len(attachment_files)}, lambda sqlite_file=sqlite_file: create_sqlite(conversation_name, messages, sqlite_file, pseudonym_mapping, attachment_files, output_folder.resolve())))
 
     if pseudonymize:
-        create_pseudonymized_txt(txt_file, pseudonym_mapping, output_folder)
-        create_pseudonym_csv(pseudonym_mapping, output_folder)
-    
+        def write_pseudonymized_files():
+            create_pseudonymized_txt(txt_file, pseudonym_mapping, output_folder)
+            create_pseudonym_csv(pseudonym_mapping, output_folder)
+        writers.append(('pseudonymize', txt_file, {}, write_pseudonymized_files))
+
+    write_outputs(writers, profiler)
+
+    if stream_from_zip:
+        with profiler.stage('manifest'):
+            state['last_message_id'] = messages.message_ids[-1] if len(messages) else None
+            state['last_message'] = [messages.timestamps[-1].isoformat(), messages.senders[messages.sender_ids[-1]]] if len(messages) else None
+            state['deduplication'] = deduplicator.to_dict() if deduplicator is not None else None
+            write_manifest(output_folder, conversation_name, pseudonymize, txt_file, state, senders, len(messages), False)
+
+    if profile or profile_parse:
+        profiler.write(output_folder / f"{zip_path.stem}_profile.json", zip_path, incremental=False)
+
+    return finish_processing(output_folder, pseudonymize, open_when_finished)
+
+def finish_processing(output_folder, pseudonymize, open_when_finished):
     print(f"\033[92mProcessing complete. Output saved to '{output_folder}'\033[0m")
 
     if pseudonymize:
         print("\033[93mWarning: Although the sender's names have been pseudonymized, other names are not and senders may still be identifiable based on metadata and/or message content.\033[0m")
 
     open_output_folder = False
-    if OPEN_WHEN_FINISHED == "yes":
+    if open_when_finished is not None:
+        open_output_folder = open_when_finished
+    elif OPEN_WHEN_FINISHED.strip().lower() == "yes":
         open_output_folder = True
-    elif OPEN_WHEN_FINISHED != "no":
+    elif OPEN_WHEN_FINISHED.strip().lower() != "no":
         open_output_folder_valid_input = False
         while not open_output_folder_valid_input:
             open_output_folder_input = input("Open ouput folder? (yes/no): ").strip().lower()
@@ -546,30 +2180,453 @@ def process_whatsapp_zip(zip_path, pseudonymize):
             else:
                 print("Invalid input.")
     if open_output_folder:
-        os.startfile(output_folder)
+        open_folder(output_folder)
+
+    return output_folder
+
+def open_folder(folder):
+    if sys.platform == 'win32':
+        os.startfile(folder)
+    else:
+        import subprocess
+        subprocess.run(['open' if sys.platform == 'darwin' else 'xdg-open', str(folder)], check=False)
+
+def find_zip_files(paths):
+    # Expand directories to the zip files they contain (not recursive)
+    zip_files = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            zip_files.extend(sorted(item for item in path.iterdir() if item.suffix.lower() == '.zip' and item.is_file()))
+        else:
+            zip_files.append(path)
+    return zip_files
+
+def run_batch_job(job):
+    # Runs in a worker process: apply the job's own configuration, then process its zip without any prompts
+    start = time.perf_counter()
+    log = io.StringIO()
+    result = {'zip': str(job['zip']), 'ok': False, 'output': None, 'error': None}
+    output_folder = Path(job['output']) if job.get('output') else Path(job['zip']).parent / Path(job['zip']).stem
+    output_existed = output_folder.exists()
+    try:
+        with redirect_stdout(log):
+            config = dict(job['config'])
+            if config['language'].strip().lower() == 'auto':
+                config['language'] = detect_zip_language(job['zip'])
+                if config['language'] is None:
+                    raise ValueError("Could not detect the interface language of the export; give it with --language")
+                print(f"\u2713 Detected interface language: {config['language'].lower()}")
+            configure(**config)
+            process_whatsapp_zip(job['zip'], job['config'].get('pseudonymize', False), overwrite=job.get('overwrite', False), open_when_finished=False, incremental=job.get('incremental', False), profile=job.get('profile', False), profile_parse=job.get('profile_parse', False), output_folder=output_folder)
+        result.update(ok=True, output=str(output_folder))
+    except Exception as e:
+        import traceback
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['traceback'] = traceback.format_exc()
+        # Don't leave a half-written output folder behind that would block a rerun
+        if not output_existed and output_folder.exists():
+            shutil.rmtree(output_folder, ignore_errors=True)
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    result['log'] = log.getvalue()
+    return result
+
+def run_batch(jobs, workers=None):
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_batch_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:  # The worker process itself died
+                result = {'zip': str(futures[future]['zip']), 'ok': False, 'output': None, 'error': f"{type(e).__name__}: {e}", 'seconds': None, 'log': ''}
+            if result['ok']:
+                print(f"\u2713 {result['zip']} ({result['seconds']} s)")
+            else:
+                print(f"\u2717 {result['zip']}: {result['error']}")
+            results.append(result)
+
+    # Report in the order the jobs were given
+    order = {str(job['zip']): index for index, job in enumerate(jobs)}
+    results.sort(key=lambda result: order.get(result['zip'], len(order)))
+    return results
+
+def print_batch_report(results, elapsed):
+    succeeded = [result for result in results if result['ok']]
+    failed = [result for result in results if not result['ok']]
+    print(f"\nBatch report: {len(succeeded)} succeeded, {len(failed)} failed in {elapsed:.1f} s")
+    for result in results:
+        if result['ok']:
+            print(f"  \u2713 {result['zip']} -> {result['output']} ({result['seconds']} s)")
+        else:
+            print(f"  \u2717 {result['zip']}: {result['error']}")
+
+WATCH_STATUS_RECENT = 20  # Finished jobs listed in the status file
+WATCH_INVALID_ZIP_SETTLES = 10  # Settle periods after which a file that still isn't a readable zip is failed
+
+def warm_up_worker(config):
+    # Runs once per worker process of the watch mode: import what the configured outputs need and build the emoji table,
+    # so every export after the first skips that work. Ctrl+C and SIGTERM (often sent to the whole process group) are left
+    # to the main process, which lets running jobs finish.
+    import signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    file_types = [file_type.strip().lower() for file_type in config['file_types']]
+    import slugify
+    if 'xlsx' in file_types:
+        import openpyxl
+    if 'parquet' in file_types:
+        import pyarrow.parquet
+    if config.get('activity_tables') or 'xlsx' in file_types:
+        import pandas
+    if config['pseudonymize']:
+        import shortuuid
+    if config['emoji_description']:
+        with redirect_stdout(io.StringIO()):
+            load_emoji_annotator(config['api_key'])
+
+def run_watch_job(job):
+    # Runs in a worker process of the watch mode: mark the job as started, so that the watcher can tell which jobs
+    # were running when a worker process died
+    Path(job['zip']).with_suffix('.started').touch()
+    return run_batch_job(job)
+
+def unique_path(folder, name):
+    # folder/name, or folder/'stem (2).zip' etc. when that is taken
+    path = folder / name
+    counter = 2
+    while path.exists():
+        path = folder / f"{Path(name).stem} ({counter}){Path(name).suffix}"
+        counter += 1
+    return path
+
+def write_watch_status(status_file, status):
+    # Written to a temporary file first, so readers never see half a status
+    status['updated'] = datetime.now().isoformat(timespec='seconds')
+    temporary_file = status_file.with_name(status_file.name + '.tmp')
+    with open(temporary_file, 'w', encoding='utf-8') as f:
+        json.dump(status, f, ensure_ascii=False, indent=4)
+    os.replace(temporary_file, status_file)
+
+def watch_inbox(inbox, config, output_dir=None, status_file=None, workers=None, poll_interval=2.0, settle_seconds=5.0, overwrite=False, incremental=False, profile=False, profile_parse=False):
+    # Service mode: process every zip that is dropped in the inbox, until interrupted (Ctrl+C or SIGTERM).
+    # A zip is claimed once its size and modification time have been unchanged for settle_seconds and it reads as a zip:
+    # it is moved to inbox/processing, processed into output_dir, and then moved to inbox/done or inbox/failed
+    # (with a .log file). Zips left in processing by an interrupted run are processed again at startup.
+    # When a worker process dies (e.g. killed for running out of memory), the pool is restarted: only the zip that
+    # was running in it is failed, and the other unfinished zips are queued again.
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    from concurrent.futures.process import BrokenProcessPool
+    import signal
+
+    inbox = Path(inbox)
+    processing_dir, done_dir, failed_dir = inbox / 'processing', inbox / 'done', inbox / 'failed'
+    output_dir = Path(output_dir) if output_dir else inbox / 'output'
+    status_file = Path(status_file) if status_file else inbox / 'status.json'
+    for folder in (processing_dir, done_dir, failed_dir, output_dir):
+        folder.mkdir(parents=True, exist_ok=True)
+
+    started = time.time()
+    status = {
+        'state': 'running', 'pid': os.getpid(), 'started': datetime.fromtimestamp(started).isoformat(timespec='seconds'), 'updated': None,
+        'inbox': str(inbox), 'output': str(output_dir), 'workers': workers or os.cpu_count(),
+        'waiting': [], 'queued': [], 'running': [], 'succeeded': 0, 'failed': 0, 'worker_restarts': 0,
+        'processed_bytes': 0, 'busy_seconds': 0.0, 'zips_per_hour': 0.0, 'mb_per_second': 0.0, 'recent': [],
+    }
+    seen = {}  # inbox zip -> ((size, mtime), time it last changed)
+    futures = {}  # future -> (zip in processing, size, whether its output folder existed)
+    backlog = []  # Claimed zips not yet handed to the pool
+    retry_alone = []  # Zips that were running when a worker died; run one at a time to find the one that kills its worker
+
+    def start_pool():
+        return ProcessPoolExecutor(max_workers=workers, initializer=warm_up_worker, initargs=(config,))
+
+    def submit(executor, zip_file):
+        output_folder = output_dir / zip_file.stem
+        job = {'zip': str(zip_file), 'config': config, 'overwrite': overwrite, 'incremental': incremental, 'profile': profile, 'profile_parse': profile_parse, 'output': str(output_folder)}
+        futures[executor.submit(run_watch_job, job)] = (zip_file, zip_file.stat().st_size, output_folder.exists())
+        print(f"\u2022 Queued '{zip_file.name}'")
+
+    def dispatch(executor):
+        # A zip leaves its list only once the pool has accepted it
+        if retry_alone:
+            if not futures:
+                submit(executor, retry_alone[0])
+                retry_alone.pop(0)
+            return
+        while backlog:
+            submit(executor, backlog[0])
+            backlog.pop(0)
+
+    def discard_unfinished(zip_file, output_existed):
+        # A job whose worker died can't clean up after itself; remove what it wrote so it can run again
+        zip_file.with_suffix('.started').unlink(missing_ok=True)
+        output_folder = output_dir / zip_file.stem
+        if not output_existed and output_folder.exists():
+            shutil.rmtree(output_folder, ignore_errors=True)
+
+    def restart_pool(executor):
+        # Every unfinished job of a broken pool fails with BrokenProcessPool. Jobs that never started are queued again;
+        # if only one had started, it is the one that killed its worker, otherwise each one is run again on its own.
+        executor.shutdown(wait=True, cancel_futures=True)
+        broken = []
+        for future in list(futures):
+            if future.cancelled() or isinstance(future.exception(), BrokenProcessPool):
+                broken.append(future)
+            else:
+                finish(future)
+        started = [future for future in broken if futures[future][0].with_suffix('.started').exists()]
+        crashed = started[0] if len(started) == 1 else None
+        for future in broken:
+            zip_file, _, output_existed = futures[future]
+            discard_unfinished(zip_file, output_existed)
+            if future is crashed:
+                finish(future)
+                continue
+            del futures[future]
+            if future in started:
+                retry_alone.append(zip_file)
+            else:
+                backlog.insert(0, zip_file)
+        if crashed is None:
+            print(f"\u26a0 A worker process died; running the {len(started)} zip(s) it may have been processing one at a time" if started else "\u26a0 A worker process died before it started a job")
+            if not started:
+                time.sleep(poll_interval)  # Don't spin when the workers can't even start
+        status['worker_restarts'] += 1
+        return start_pool()
+
+    def claim_settled_zips():
+        now = time.monotonic()
+        present = set()
+        for zip_file in sorted(inbox.glob('*.zip'), key=lambda item: item.name.lower()):
+            try:
+                stat = zip_file.stat()
+            except FileNotFoundError:
+                continue
+            present.add(zip_file)
+            signature = (stat.st_size, stat.st_mtime_ns)
+            previous = seen.get(zip_file)
+            if previous is None or previous[0] != signature:
+                seen[zip_file] = (signature, now)
+                continue
+            # Still being written, or a previous export of the same chat is still being processed
+            if now - previous[1] < settle_seconds or (processing_dir / zip_file.name).exists():
+                continue
+            if not zipfile.is_zipfile(zip_file):
+                # A writer may pause, but a file that stays unreadable for much longer than that is not a zip
+                if now - previous[1] >= WATCH_INVALID_ZIP_SETTLES * settle_seconds:
+                    destination = unique_path(failed_dir, zip_file.name)
+                    os.replace(zip_file, destination)
+                    with open(destination.with_suffix('.log'), 'w', encoding='utf-8') as f:
+                        f.write("Not a zip file\n")
+                    del seen[zip_file]
+                    present.discard(zip_file)
+                    status['failed'] += 1
+                    print(f"\u2717 {zip_file.name}: not a zip file")
+                continue
+            claimed = processing_dir / zip_file.name
+            try:
+                os.replace(zip_file, claimed)
+            except FileNotFoundError:  # Claimed by another watcher on the same inbox
+                del seen[zip_file]
+                continue
+            del seen[zip_file]
+            present.discard(zip_file)
+            backlog.append(claimed)
+        for zip_file in set(seen) - present:
+            del seen[zip_file]
+
+    def finish(future):
+        zip_file, size, _ = futures.pop(future)
+        try:
+            result = future.result()
+        except Exception as e:  # The worker process itself died
+            result = {'zip': str(zip_file), 'ok': False, 'output': None, 'error': f"{type(e).__name__}: {e}", 'seconds': None, 'log': ''}
+        zip_file.with_suffix('.started').unlink(missing_ok=True)
+        destination = unique_path(done_dir if result['ok'] else failed_dir, zip_file.name)
+        os.replace(zip_file, destination)
+        if result['ok']:
+            status['succeeded'] += 1
+            status['processed_bytes'] += size
+            print(f"\u2713 {zip_file.name} -> {result['output']} ({result['seconds']} s)")
+        else:
+            status['failed'] += 1
+            with open(destination.with_suffix('.log'), 'w', encoding='utf-8') as f:
+                f.write(result['log'])
+                f.write(result.get('traceback') or result['error'])
+            print(f"\u2717 {zip_file.name}: {result['error']}")
+        status['busy_seconds'] = round(status['busy_seconds'] + (result['seconds'] or 0), 3)
+        status['recent'] = ([{'zip': zip_file.name, 'ok': result['ok'], 'seconds': result['seconds'], 'error': result['error'], 'moved_to': str(destination)}] + status['recent'])[:WATCH_STATUS_RECENT]
+
+    def update_status(state='running'):
+        elapsed = max(time.time() - started, 1e-9)
+        status['state'] = state
+        status['waiting'] = sorted(zip_file.name for zip_file in seen)
+        status['queued'] = sorted([zip_file.name for future, (zip_file, _, _) in futures.items() if not future.running()] + [zip_file.name for zip_file in backlog + retry_alone])
+        status['running'] = sorted(zip_file.name for future, (zip_file, _, _) in futures.items() if future.running())
+        status['zips_per_hour'] = round((status['succeeded'] + status['failed']) * 3600 / elapsed, 2)
+        status['mb_per_second'] = round(status['processed_bytes'] / 1e6 / elapsed, 3)
+        write_watch_status(status_file, status)
+
+    # Service managers stop processes with SIGTERM; treat it like Ctrl+C
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, stop)
+
+    print(f"\u2022 Watching '{inbox}' for zip files (Ctrl+C to stop); results go to '{output_dir}'")
+    for marker in processing_dir.glob('*.started'):
+        marker.unlink()
+    backlog.extend(sorted(processing_dir.glob('*.zip')))
+    executor = start_pool()
+    try:
+        while True:
+            claim_settled_zips()
+            try:
+                dispatch(executor)
+            except BrokenProcessPool:
+                executor = restart_pool(executor)
+                continue
+            update_status()
+            if futures:
+                done, _ = wait(list(futures), timeout=poll_interval, return_when=FIRST_COMPLETED)
+                if any(not future.cancelled() and isinstance(future.exception(), BrokenProcessPool) for future in done):
+                    executor = restart_pool(executor)
+                    continue
+                for future in done:
+                    finish(future)
+            else:
+                time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        # Queued zips stay in processing and are picked up again by the next run
+        print("\u2022 Stopping: waiting for the running jobs to finish...")
+        executor.shutdown(wait=True, cancel_futures=True)
+        for future in [future for future in futures if not future.cancelled()]:
+            finish(future)
+        futures.clear()
+        update_status('stopped')
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return 0
+
+def build_argument_parser():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Repackage WhatsApp zip exports. Without arguments the script asks for its settings interactively; with zip files or folders it runs them as a non-interactive batch.")
+    parser.add_argument('paths', nargs='*', help="zip files and/or folders containing zip files")
+    parser.add_argument('--language', default='auto', help="interface language of the exports: " + ", ".join(code.lower() for code in LANGUAGE_SETTINGS) + ", or auto to detect it per export (default: auto)")
+    parser.add_argument('--file-types', default='csv,xlsx,json', help="comma separated output types: " + ", ".join(ALLOWED_FILE_TYPES) + " (default: csv,xlsx,json)")
+    parser.add_argument('--pseudonymize', action='store_true', help="replace participant names by pseudonyms")
+    parser.add_argument('--emoji-descriptions', action='store_true', help="add emoji descriptions to messages")
+    parser.add_argument('--deduplicate', action='store_true', help="store identical attachments once and hardlink the other copies")
+    parser.add_argument('--api-key', default="", help="emoji-api.com key (optional when the emoji cache is filled)")
+    parser.add_argument('--activity-tables', action='store_true', help="write the activity tables as csv files (with xlsx they are always added to the Summary sheet)")
+    parser.add_argument('--sqlite-archive', help="also load every conversation into this shared SQLite database (with a full-text index)")
+    parser.add_argument('--overwrite', action='store_true', help="replace existing output folders instead of failing the job")
+    parser.add_argument('--incremental', action='store_true', help="add only new messages and attachments to output folders that were made by an earlier run")
+    parser.add_argument('--attachment-workers', type=int, default=4, help="threads per job placing attachments while the chat is parsed; 0 to place them inline (default: 4)")
+    parser.add_argument('--parse-workers', type=int, default=0, help="processes per job parsing chats larger than 4 MB in chunks; 0 parses in the job's own process (default: 0)")
+    parser.add_argument('--output-workers', type=int, default=4, help="output files per job written at the same time, by forked processes (threads on Windows and macOS); 0 writes them one after another (default: 4)")
+    parser.add_argument('--profile', action='store_true', help="write a per-stage timing report (<name>_profile.json) to each output folder")
+    parser.add_argument('--profile-parse', action='store_true', help="like --profile, and also dump a cProfile of the parse stage (<name>_profile_parse.prof)")
+    parser.add_argument('--workers', type=int, default=None, help="number of worker processes (default: number of CPUs)")
+    parser.add_argument('--jobs', help="json file with a list of jobs, e.g. [{\"zip\": \"chat.zip\", \"language\": \"nl\"}]; missing settings default to the command line options")
+    parser.add_argument('--report', help="also write the batch report to this json file")
+    parser.add_argument('--watch', metavar='INBOX', help="keep running and process every zip dropped in this folder, moving it to INBOX/done or INBOX/failed afterwards")
+    parser.add_argument('--output-dir', help="with --watch: folder for the output folders (default: INBOX/output)")
+    parser.add_argument('--status-file', help="with --watch: json file with the queue and throughput counters, rewritten every poll (default: INBOX/status.json)")
+    parser.add_argument('--poll-interval', type=float, default=2.0, help="with --watch: seconds between scans of the inbox (default: 2)")
+    parser.add_argument('--settle', type=float, default=5.0, help="with --watch: seconds a zip must stay unchanged before it is processed (default: 5)")
+    return parser
+
+def main_batch(argv):
+    parser = build_argument_parser()
+    args = parser.parse_args(argv)
+
+    defaults = {
+        'language': args.language,
+        'file_types': [file_type for file_type in args.file_types.split(',') if file_type.strip()],
+        'pseudonymize': args.pseudonymize,
+        'emoji_description': args.emoji_descriptions,
+        'api_key': args.api_key,
+        'deduplicate_attachments': args.deduplicate,
+        'attachment_workers': args.attachment_workers,
+        'parse_workers': args.parse_workers,
+        'output_workers': args.output_workers,
+        'activity_tables': args.activity_tables,
+        'sqlite_archive': args.sqlite_archive,
+    }
+
+    if args.watch:
+        if args.paths or args.jobs:
+            parser.error("--watch can't be combined with zip files or --jobs")
+        if defaults['language'].strip().upper() not in LANGUAGE_SETTINGS and defaults['language'].strip().lower() != 'auto':
+            parser.error(f"unsupported language '{defaults['language']}'")
+        return watch_inbox(args.watch, defaults, args.output_dir, args.status_file, args.workers, args.poll_interval, args.settle, args.overwrite, args.incremental, args.profile, args.profile_parse)
+
+    # Every job carries its own configuration
+    job_specs = [{'zip': zip_file} for zip_file in find_zip_files(args.paths)]
+    if args.jobs:
+        with open(args.jobs, 'r', encoding='utf-8') as f:
+            job_specs += json.load(f)
+    if not job_specs:
+        parser.error("no zip files given")
+
+    jobs = []
+    for spec in job_specs:
+        config = {key: spec.get(key, value) for key, value in defaults.items()}
+        if isinstance(config['file_types'], str):
+            config['file_types'] = config['file_types'].split(',')
+        if config['language'].strip().upper() not in LANGUAGE_SETTINGS and config['language'].strip().lower() != 'auto':
+            parser.error(f"unsupported language '{config['language']}' for '{spec['zip']}'")
+        jobs.append({'zip': str(spec['zip']), 'config': config, 'overwrite': spec.get('overwrite', args.overwrite), 'incremental': spec.get('incremental', args.incremental), 'profile': spec.get('profile', args.profile), 'profile_parse': spec.get('profile_parse', args.profile_parse)})
+
+    start = time.perf_counter()
+    results = run_batch(jobs, args.workers)
+    print_batch_report(results, time.perf_counter() - start)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=4)
+
+    return 0 if all(result['ok'] for result in results) else 1
 
 def create_pseudonym_mapping(senders):
     pseudonym_mapping = {}
     if pseudonymize:
+        import shortuuid
         for sender in senders:
             if sender not in pseudonym_mapping:
                 pseudonym_mapping[sender] = shortuuid.ShortUUID().random(length=6)
     return pseudonym_mapping            
             
-def replace_names_by_pseudonymes(text, mapping):
-    for real_name, pseudonym in mapping.items():
-        text = str(text).replace(real_name, pseudonym)
-    return text
+def build_pseudonym_replacer(mapping):
+    # One longest-match scan replaces every name at once, so 'Jan Peeters' wins over 'Jan'
+    if not mapping:
+        return str
+    name_pattern = re.compile(build_trie_pattern(build_trie(mapping)))
+
+    def replace_names(text):
+        return name_pattern.sub(lambda match: mapping[match.group(0)], str(text))
+
+    return replace_names
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    sys.exit(main_batch(sys.argv[1:]))
 
 if __name__ == "__main__":
-    message_pattern = re.compile(r"(\d{1,2}/\d{1,2}/\d{2,4},?\s*\d{1,2}:\d{2}\s*([ap]m\s)?)- (.+?): (.+)", re.IGNORECASE)
-    
     zip_file_path = input("\u2022 Enter the path to the WhatsApp ZIP file: ").strip().replace('"','')
     
-    allowed_languages = ['EN', 'FR', 'NL', 'DE', 'ES', 'IT', 'PT']
+    allowed_languages = list(LANGUAGE_SETTINGS)
+    language = None
     if LANGUAGE.strip().upper() in allowed_languages:
         language = LANGUAGE.strip().upper()
-    else:
+    elif LANGUAGE.strip().lower() == "auto" and Path(zip_file_path).is_file():
+        language = detect_zip_language(zip_file_path)
+        if language:
+            print(f"\u2713 Detected interface language: {language.lower()}")
+    if language is None:
         valid_language_input = False
         while not(valid_language_input):
             language_input = input("\u2022 No language was set in the script. What was the interface language of the export? (en/fr/nl/de/es/it/pt): ").strip().upper()
@@ -579,34 +2636,10 @@ if __name__ == "__main__":
             else:
                 print("Invalid input.")
     
-    attachment_indicator = ""
-    deleted_message_warnings = []
-    if language.strip().upper() == 'EN':  # Translation confirmed 28.8.2024
-        attachment_indicator = "file attached"
-        deleted_message_warnings = ["This message was deleted", "You deleted this message"]
-    elif language.strip().upper() == 'FR':  # Translation confirmed 28.8.2024
-        attachment_indicator = "fichier joint"
-        deleted_message_warnings = ["Ce message a été supprimé", "Vous avez supprimé ce message"]
-    elif language.strip().upper() == 'NL':  # Translation confirmed 28.8.2024
-        attachment_indicator = "bestand bijgevoegd"
-        deleted_message_warnings = ["Dit bericht is verwijderd", "U hebt dit bericht verwijderd"]
-    elif language.strip().upper() == 'DE':  # Translation not confirmed
-        attachment_indicator = "Dateianhang"
-        deleted_message_warnings = ["Diese Nachricht wurde gelöscht", "Sie haben diese Nachricht gelöscht"]
-    elif language.strip().upper() == 'ES':  # Translation not confirmed
-        attachment_indicator = "archivo adjunto"
-        deleted_message_warnings = ["Este mensaje fue eliminado", "Has eliminado este mensaje"]
-    elif language.strip().upper() == 'IT':  # Translation not confirmed
-        attachment_indicator = "file allegato"
-        deleted_message_warnings = ["Questo messaggio è stato eliminato", "Hai eliminato questo messaggio"]
-    elif language.strip().upper() == 'PT':  # Translation not confirmed
-        attachment_indicator = "arquivo anexado"
-        deleted_message_warnings = ["Esta mensagem foi apagada", "Você apagou esta mensagem"]
-    else:
-        raise ValueError(f"Unsupported language code: {language}")
+    attachment_indicator, deleted_message_warnings = LANGUAGE_SETTINGS[language]
 
     file_type_valid_input = False
-    allowed_file_types = ['csv', 'xlsx', 'json']
+    allowed_file_types = ALLOWED_FILE_TYPES
     if FILE_TYPES.strip().lower() != "ask":
         file_types = FILE_TYPES.split(",")
         file_types = [type.strip().lower() for type in file_types]
@@ -619,7 +2652,7 @@ if __name__ == "__main__":
             file_type_valid_input = True
     else:
         while not file_type_valid_input:    
-            file_types_input = input("\u2022 Which files do you want to generate? (csv, xlsx, json, multiple separated by commas, or enter for all): ").strip().lower()
+            file_types_input = input("\u2022 Which files do you want to generate? (csv, xlsx, json, ndjson, sqlite, parquet, multiple separated by commas, or enter for all): ").strip().lower()
             if not file_types_input:
                 file_types = ['csv', 'xlsx', 'json']
                 file_type_valid_input = True
@@ -671,6 +2704,40 @@ if __name__ == "__main__":
                 else:
                     print("Invalid input.")
 
+        if DEDUPLICATE_ATTACHMENTS.strip().lower() == "yes":
+            deduplicate_attachments = True
+        elif DEDUPLICATE_ATTACHMENTS.strip().lower() == "no":
+            deduplicate_attachments = False
+        else:
+            deduplicate_valid_input = False
+            while not deduplicate_valid_input:
+                deduplicate_input = input("\u2022 Would you like to store identical attachments only once? (yes/no): ").strip().lower()
+                if deduplicate_input == 'yes':
+                    deduplicate_attachments = True
+                    deduplicate_valid_input = True
+                elif deduplicate_input == "no":
+                    deduplicate_attachments = False
+                    deduplicate_valid_input = True
+                else:
+                    print("Invalid input.")
+
+        if WRITE_ACTIVITY_TABLES.strip().lower() == "yes":
+            activity_tables = True
+        elif WRITE_ACTIVITY_TABLES.strip().lower() == "no":
+            activity_tables = False
+        else:
+            activity_tables_valid_input = False
+            while not activity_tables_valid_input:
+                activity_tables_input = input("\u2022 Would you like to write activity tables (messages per day, week, month and hour, response gaps) as csv files? (yes/no): ").strip().lower()
+                if activity_tables_input == 'yes':
+                    activity_tables = True
+                    activity_tables_valid_input = True
+                elif activity_tables_input == "no":
+                    activity_tables = False
+                    activity_tables_valid_input = True
+                else:
+                    print("Invalid input.")
+
         api_key = ""
         if emoji_description:
             api_pattern = r"^[0-9a-fA-F]{40}$"